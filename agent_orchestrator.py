@@ -9,6 +9,10 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from pydantic import BaseModel , Field
 import os
 from dotenv import load_dotenv
+from utils.money import cents_of
+from utils.forecasting import monthly_category_totals, forecast_next_month, rising_categories
+from utils.health_score import spending_health_score
+from utils.recurring import find_recurring_expenses
 load_dotenv()
 
 api = os.getenv("API_KEY")
@@ -77,28 +81,44 @@ class AIAgentOrchestrator:
         }
             
     def generate_budget_with_ai(self, income: float, expense_history: List[Dict], 
-                               goals: str = "", risk_tolerance: str = "moderate") -> Dict[str, Any]:
-        """Generate personalized budget using actual expense data"""
+                               goals: str = "", risk_tolerance: str = "moderate",
+                               recurring_expenses: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Generate personalized budget using actual expense data
         
-        # Analyze current spending patterns in detail
-        total_spent = sum(exp.get('amount', 0) for exp in expense_history)
+        recurring_expenses are the charges found by utils.recurring; they are
+        detected from expense_history when not given and it has merchants.
+        """
+        
+        # Analyze current spending patterns in detail, summing exact cents
+        total_cents = 0
         categories = {}
         monthly_spending = {}
-        recurring_expenses = []
+        if recurring_expenses is None:
+            recurring_expenses = []
+            if expense_history and 'merchant' in expense_history[0]:
+                recurring_expenses = find_recurring_expenses(pd.DataFrame(expense_history))
+        active_recurring = [
+            {key: charge[key] for key in ('merchant', 'category', 'period', 'amount', 'monthly_cost')}
+            for charge in recurring_expenses if charge.get('active', True)
+        ]
+        recurring_monthly = sum(charge['monthly_cost'] for charge in active_recurring)
         
         for exp in expense_history:
+            cents = cents_of(exp) or 0
+            total_cents += cents
             cat = exp.get('category', 'Other')
-            categories[cat] = categories.get(cat, 0) + exp.get('amount', 0)
+            categories[cat] = categories.get(cat, 0) + cents
             
             # Track monthly patterns
             month = exp.get('date', '')[:7]
             if month not in monthly_spending:
                 monthly_spending[month] = 0
-            monthly_spending[month] += exp.get('amount', 0)
+            monthly_spending[month] += cents
             
-        
+        categories = {cat: cents / 100 for cat, cents in categories.items()}
+        monthly_spending = {month: cents / 100 for month, cents in monthly_spending.items()}
         months_count = len(monthly_spending) if monthly_spending else 1
-        avg_monthly = total_spent / months_count
+        avg_monthly = total_cents / 100 / months_count
         
         prompt = f"""Create a personalized budget based on actual spending data. Return only valid JSON.
 
@@ -115,6 +135,9 @@ Actual Spending by Category:
 Monthly Spending History:
 {json.dumps(monthly_spending)}
 
+Detected Recurring Charges (fixed costs, ${recurring_monthly:.2f} per month in total):
+{json.dumps(active_recurring)}
+
 Create realistic budget using 50/30/20 principles but adjusted for actual spending patterns.
 
 Return ONLY JSON, For example (note: Remember that it is just an example, you can change the values based on
@@ -170,6 +193,7 @@ Use actual spending data to make realistic recommendations."""
             budget_data = json.loads(result)
             budget_data["created_date"] = datetime.now().strftime("%Y-%m-%d")
             budget_data["data_months"] = months_count
+            budget_data["recurring_expenses"] = active_recurring
             
             # Store in agent memory
             self.agent_memory["budget_data"] = budget_data
@@ -180,8 +204,17 @@ Use actual spending data to make realistic recommendations."""
             print(f"Budget AI generation error: {e}")
             
     
-    def generate_insights_with_ai(self, expense_data: List[Dict]) -> Dict[str, Any]:
-        """Generate financial insights using AI agent"""
+    def generate_insights_with_ai(self, expense_data: List[Dict],
+                                  monthly_history: Optional[Dict[str, Dict[str, float]]] = None,
+                                  health: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Generate financial insights using AI agent
+        
+        next_month_forecast is computed locally by utils.forecasting from
+        monthly_history ({month: {category: amount}}, the whole ledger when
+        given) or from expense_data. health_score and spending_health come
+        from utils.health_score (health, or scored from expense_data). The
+        LLM only comments on these numbers in its text and health_narrative.
+        """
         
         if not expense_data:
             return {
@@ -194,20 +227,45 @@ Use actual spending data to make realistic recommendations."""
             }
         
         # Prepare data summary
-        total_amount = sum(exp.get('amount', 0) for exp in expense_data)
+        total_cents = 0
         categories = {}
         merchants = {}
         
         for exp in expense_data:
+            cents = cents_of(exp) or 0
+            total_cents += cents
             cat = exp.get('category', 'Other')
-            categories[cat] = categories.get(cat, 0) + exp.get('amount', 0)
+            categories[cat] = categories.get(cat, 0) + cents
             
             merchant = exp.get('merchant', 'Unknown')  
-            merchants[merchant] = merchants.get(merchant, 0) + exp.get('amount', 0)
+            merchants[merchant] = merchants.get(merchant, 0) + cents
         
+        total_amount = total_cents / 100
         # Get top categories and merchants
-        top_categories = dict(sorted(categories.items(), key=lambda x: x[1], reverse=True)[:5])
-        top_merchants = dict(sorted(merchants.items(), key=lambda x: x[1], reverse=True)[:5])
+        top_categories = {cat: cents / 100 for cat, cents in sorted(categories.items(), key=lambda x: x[1], reverse=True)[:5]}
+        top_merchants = {merchant: cents / 100 for merchant, cents in sorted(merchants.items(), key=lambda x: x[1], reverse=True)[:5]}
+        
+        # Statistical forecast, computed locally rather than guessed by the LLM
+        history = monthly_history or monthly_category_totals(expense_data)
+        forecast = forecast_next_month(history)
+        next_month_forecast = {
+            "month": forecast["month"],
+            "predicted_total": forecast["predicted_total"],
+            "lower": forecast["lower"],
+            "upper": forecast["upper"],
+            "categories": forecast["categories"],
+            "risk_areas": rising_categories(forecast, history) or list(top_categories.keys())[:2]
+        }
+        category_forecasts = {cat: stats["predicted"] for cat, stats in forecast["categories"].items()}
+        
+        # Deterministic health score; the LLM only narrates it
+        if health is None:
+            health = spending_health_score(pd.DataFrame(expense_data))
+        health_components = {name: component["score"] for name, component in health["components"].items()}
+        weakest = min(health_components, key=health_components.get) if health_components else None
+        health_narrative = f"Health score {health['score']}/100 ({health['rating']})"
+        if weakest:
+            health_narrative += f"; weakest area: {weakest.replace('_', ' ')} ({health_components[weakest]}/100)"
         
         prompt = f"""Analyze spending patterns and provide insights. Return only valid JSON.
 
@@ -216,6 +274,9 @@ Data Summary:
 - Number of Transactions: {len(expense_data)}
 - Top Categories: {json.dumps(top_categories)}
 - Top Merchants: {json.dumps(top_merchants)}
+- Forecast for {forecast["month"]}: ${forecast["predicted_total"]:.2f} (80% range ${forecast["lower"]:.2f} - ${forecast["upper"]:.2f})
+- Forecast by Category: {json.dumps(category_forecasts)}
+- Spending Health Score: {health["score"]}/100 ({health["rating"]}), component scores: {json.dumps(health_components)}
 
 Return ONLY this JSON with NO additional text:
 {{
@@ -229,15 +290,10 @@ Return ONLY this JSON with NO additional text:
         "Specific saving opportunity",
         "Budget optimization suggestion"
     ],
-    "spending_health": "good",
-    "health_score": 75,
     "trends": [
         "Notable spending trend"
     ],
-    "next_month_forecast": {{
-        "predicted_total": {total_amount:.0f},
-        "risk_areas": ["category1", "category2"]
-    }}
+    "health_narrative": "One or two sentences explaining the given health score from its component scores"
 }}
 
 Focus on practical, actionable advice."""
@@ -263,10 +319,12 @@ Focus on practical, actionable advice."""
             # Ensure required fields with defaults
             parsed.setdefault("insights", [f"You've spent ${total_amount:.2f} across {len(expense_data)} transactions"])
             parsed.setdefault("recommendations", ["Track expenses regularly", "Create a monthly budget"])
-            parsed.setdefault("spending_health", "moderate")
-            parsed.setdefault("health_score", 70)
             parsed.setdefault("trends", [])
-            parsed.setdefault("next_month_forecast", {"predicted_total": total_amount, "risk_areas": []})
+            parsed.setdefault("health_narrative", health_narrative)
+            parsed["health_score"] = health["score"]
+            parsed["spending_health"] = health["rating"]
+            parsed["health_components"] = health["components"]
+            parsed["next_month_forecast"] = next_month_forecast
             
             return parsed
             
@@ -275,10 +333,12 @@ Focus on practical, actionable advice."""
             return {
                 "insights": [f"Total spending: ${total_amount:.2f} across {len(expense_data)} transactions"],
                 "recommendations": ["Review spending patterns weekly", "Set category budgets"],
-                "spending_health": "moderate",
-                "health_score": 65,
+                "spending_health": health["rating"],
+                "health_score": health["score"],
+                "health_components": health["components"],
+                "health_narrative": health_narrative,
                 "trends": ["Regular expense tracking needed"],
-                "next_month_forecast": {"predicted_total": total_amount, "risk_areas": list(top_categories.keys())[:2]}
+                "next_month_forecast": next_month_forecast
             }
     
     def get_personalized_advice(self, user_query: str, context: Dict = None) -> str:
@@ -7,10 +7,16 @@ import json
 import base64
 from PIL import Image
 import io
+import os
+import tempfile
 
 from utils.ocr_processor import OCRProcessor
 from agent_orchestrator import AIAgentOrchestrator
-from utils.data_manager import DataManager
+from utils.tenants import TenantRegistry, user_tenant, ledger_tenant
+from utils.sqlite_store import COLUMNS as EXPENSE_COLUMNS
+from utils.bank_importer import import_bank_statement
+from utils.money import format_cents
+from utils.health_score import spending_health_score
 from utils.visualizations import create_spending_chart, create_category_pie_chart, create_budget_gauge
 from utils.styles import apply_custom_styles
 
@@ -18,9 +24,45 @@ from utils.styles import apply_custom_styles
 @st.cache_resource
 def initialize_components():
     ocr = OCRProcessor()
-    ai_orchestrator = AIAgentOrchestrator()
-    data_manager = DataManager()
-    return ocr, ai_orchestrator, data_manager
+    # One ledger per user; idle users' ledgers are evicted from memory
+    tenants = TenantRegistry(base_dir="ledgers", max_tenants=16)
+    return ocr, tenants
+
+def current_tenant():
+    """Tenant id of the signed-in user, or of the ledger name entered in the sidebar
+    
+    Typed ledger names live in their own namespace, so typing a user's
+    email never opens that user's ledger.
+    """
+    user = getattr(st, "user", None)
+    try:
+        if user is not None and user.is_logged_in:
+            return user_tenant(user.email)
+    except Exception:
+        pass
+    name = st.sidebar.text_input("👤 Ledger", value="default", help="Each name keeps a separate expense ledger")
+    return ledger_tenant(name.strip() or "default")
+
+def get_session_orchestrator(tenant_id):
+    """AI orchestrator whose agent memory belongs to this session's tenant"""
+    if st.session_state.get("orchestrator_tenant") != tenant_id:
+        st.session_state["ai_orchestrator"] = AIAgentOrchestrator()
+        st.session_state["orchestrator_tenant"] = tenant_id
+    return st.session_state["ai_orchestrator"]
+
+def export_download_button(data_manager, fmt, columns, compress, label, file_name, mime):
+    """Stream an export to a temp file and offer it as a download"""
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(file_name)[1])
+    os.close(fd)
+    try:
+        if not data_manager.write_export(path, fmt, columns=columns, compress=compress):
+            st.error("❌ Export failed. Please try again.")
+            return
+        # download_button accepts an open binary file (BufferedReader)
+        with open(path, 'rb') as f:
+            st.download_button(label=label, data=f, file_name=file_name, mime=mime)
+    finally:
+        os.remove(path)
 
 def main():
     st.set_page_config(
@@ -34,10 +76,14 @@ def main():
     apply_custom_styles()
     
     # Initialize AI Agent System
-    ocr, ai_orchestrator, data_manager = initialize_components()
+    ocr, tenants = initialize_components()
+    tenant_id = current_tenant()
+    data_manager = tenants.get(tenant_id)
+    ai_orchestrator = get_session_orchestrator(tenant_id)
     
-    # Load existing data
-    expenses_df = data_manager.load_expenses()
+    # Load existing data; the views below never show description or items,
+    # so those wide text columns are left on disk
+    expenses_df = data_manager.load_expenses(columns=['id', 'date', 'merchant', 'amount', 'amount_cents', 'category'])
     
     # Header
     st.markdown("""
@@ -52,9 +98,10 @@ def main():
         st.markdown("### 📊 Quick Stats")
         
         if not expenses_df.empty:
-            total_spent = expenses_df['amount'].sum()
-            avg_transaction = expenses_df['amount'].mean()
-            transaction_count = len(expenses_df)
+            category_summary = data_manager.get_category_summary()
+            total_spent = sum(category_summary.get('sum', {}).values())
+            transaction_count = sum(category_summary.get('count', {}).values())
+            avg_transaction = total_spent / transaction_count if transaction_count else 0
             
             col1, col2 = st.columns(2)
             with col1:
@@ -63,8 +110,8 @@ def main():
             with col2:
                 st.metric("Avg Transaction", f"${avg_transaction:.2f}")
                 if len(expenses_df) >= 2:
-                    recent_change = expenses_df.iloc[-1]['amount'] - expenses_df.iloc[-2]['amount']
-                    st.metric("Last Change", f"${recent_change:.2f}")
+                    recent_change = expenses_df.iloc[-1]['amount_cents'] - expenses_df.iloc[-2]['amount_cents']
+                    st.metric("Last Change", format_cents(recent_change))
         else:
             st.info("Upload your first receipt to see stats!")
         
@@ -75,9 +122,9 @@ def main():
         monthly_budget = st.number_input("Set your budget", min_value=0.0, value=1000.0, step=50.0)
         
         if not expenses_df.empty:
-            current_month_spending = expenses_df[
-                pd.to_datetime(expenses_df['date']).dt.month == datetime.now().month
-            ]['amount'].sum()
+            current_month_spending = data_manager.get_monthly_summary().get(
+                datetime.now().strftime('%Y-%m'), 0
+            )
             
             budget_percentage = (current_month_spending / monthly_budget) * 100
             st.plotly_chart(create_budget_gauge(budget_percentage), use_container_width=True)
@@ -141,6 +188,17 @@ def main():
                             _description = ai_extracted_data["description"]
                             description = st.text_input("Description", value=_description)
                             
+                            duplicate_ids = data_manager.find_duplicates(ai_extracted_data)
+                            if duplicate_ids:
+                                original = data_manager.get_expense(duplicate_ids[0]) or {}
+                                st.warning(f"⚠️ This looks like a receipt already saved on {original.get('date', 'an earlier date')}.")
+                            
+                            anomaly = data_manager.check_anomaly(ai_extracted_data)
+                            if anomaly and anomaly['anomalous']:
+                                st.warning(f"⚠️ Unusual amount for {ai_extracted_data.get('category', 'this category')}: "
+                                           f"your recent {ai_extracted_data.get('category', '')} expenses are around "
+                                           f"${anomaly['expected']:.2f}. Please double-check the total.")
+                            
                             if st.button("💾 Save Expense", type="primary"):
                                 expense_data = ai_extracted_data
                                 
@@ -162,6 +220,18 @@ def main():
         if expenses_df.empty:
             st.info("📷 Upload your first receipt to see your dashboard!")
         else:
+            # Full-text search over merchant, items and description
+            search_text = st.text_input("🔎 Search receipts", placeholder="e.g. cappuccino, shampoo, Ali Store")
+            if search_text:
+                results_df = data_manager.search_expenses(
+                    search_text, columns=['date', 'merchant', 'amount', 'amount_cents', 'category', 'items'], limit=100
+                )
+                if results_df.empty:
+                    st.info("No matching expenses found.")
+                else:
+                    st.caption(f"{len(results_df)} matching expense(s), total {format_cents(results_df['amount_cents'].sum())}")
+                    st.dataframe(results_df.drop(columns='amount_cents'), use_container_width=True, hide_index=True)
+            
             # Recent transactions
             st.markdown("#### Recent Transactions")
             recent_df = expenses_df.tail(5).sort_values('date', ascending=False)
@@ -178,6 +248,26 @@ def main():
                     with col4:
                         st.write(expense['date'])
             
+            # Recurring charges and subscriptions
+            recurring = [charge for charge in data_manager.find_recurring_expenses() if charge['active']]
+            if recurring:
+                st.markdown("#### 🔁 Recurring Charges")
+                recurring_df = pd.DataFrame(recurring)[
+                    ['merchant', 'category', 'period', 'amount', 'monthly_cost', 'last_date', 'next_date']
+                ]
+                st.caption(f"{len(recurring)} active recurring charge(s), about "
+                           f"${recurring_df['monthly_cost'].sum():.2f} per month")
+                st.dataframe(recurring_df, use_container_width=True, hide_index=True)
+            
+            # Expenses far outside their category's usual range
+            anomalies_df = data_manager.find_anomalous_expenses()
+            if not anomalies_df.empty:
+                with st.expander(f"⚠️ {len(anomalies_df)} unusual expense(s)"):
+                    st.dataframe(
+                        anomalies_df[['date', 'merchant', 'category', 'amount', 'expected']],
+                        use_container_width=True, hide_index=True
+                    )
+            
             # Charts
             col1, col2 = st.columns(2)
             
@@ -204,44 +294,69 @@ def main():
             with col2:
                 end_date = st.date_input("End Date", value=datetime.now())
             
-            # Filter data
-            filtered_df = expenses_df[
-                (pd.to_datetime(expenses_df['date']) >= pd.to_datetime(start_date)) &
-                (pd.to_datetime(expenses_df['date']) <= pd.to_datetime(end_date))
-            ]
+            # Range totals come from the prefix-sum index, not a pass over the frame
+            range_summary = data_manager.get_range_summary(start_date, end_date)
             
-            if not filtered_df.empty:
+            if range_summary.get('count'):
                 # Analytics metrics
                 col1, col2, col3, col4 = st.columns(4)
                 
                 with col1:
-                    total = filtered_df['amount'].sum()
-                    st.metric("Total Spent", f"${total:.2f}")
+                    st.metric("Total Spent", f"${range_summary['sum']:.2f}")
                 
                 with col2:
-                    avg_daily = filtered_df.groupby('date')['amount'].sum().mean()
-                    st.metric("Avg Daily", f"${avg_daily:.2f}")
+                    st.metric("Avg Daily", f"${range_summary['daily_mean']:.2f}")
                 
                 with col3:
-                    max_expense = filtered_df['amount'].max()
-                    st.metric("Largest Expense", f"${max_expense:.2f}")
+                    st.metric("Largest Expense", f"${range_summary['max']:.2f}")
                 
                 with col4:
-                    top_category = filtered_df.groupby('category')['amount'].sum().idxmax()
-                    st.metric("Top Category", top_category)
+                    st.metric("Top Category", range_summary['top_category'])
                 
                 # Detailed breakdown
                 st.markdown("#### Category Breakdown")
-                category_summary = filtered_df.groupby('category').agg({
-                    'amount': ['sum', 'mean', 'count']
-                }).round(2)
-                category_summary.columns = ['Total', 'Average', 'Count']
-                st.dataframe(category_summary, use_container_width=True)
+                category_summary = pd.DataFrame.from_dict(range_summary['categories'], orient='index')
+                category_summary = category_summary.rename(columns={'sum': 'Total', 'mean': 'Average', 'count': 'Count'})
+                category_summary['Average'] = category_summary['Average'].round(2)
+                st.dataframe(category_summary[['Total', 'Average', 'Count']].sort_index(), use_container_width=True)
+                
+                filtered_df = data_manager.query(
+                    start_date=start_date,
+                    end_date=end_date,
+                    columns=['date', 'merchant', 'amount', 'amount_cents', 'category']
+                )
+                
+                # Health Score, computed locally so it renders before the AI call
+                health = spending_health_score(filtered_df, monthly_budget, start_date, end_date)
+                health_score = health['score']
+                st.markdown(f"#### 🏥 Spending Health Score: {health_score}/100")
+                
+                if health_score >= 80:
+                    st.success("Excellent financial health!")
+                elif health_score >= 60:
+                    st.warning("Good, but room for improvement")
+                else:
+                    st.error("Needs attention - consider budget adjustments")
+                
+                if health['components']:
+                    component_cols = st.columns(len(health['components']))
+                    for col, (name, component) in zip(component_cols, health['components'].items()):
+                        with col:
+                            st.metric(name.replace('_', ' ').title(), f"{component['score']}/100")
                 
                 # AI Agent Insights
                 st.markdown("#### 🤖 AI Agent Insights")
+                monthly_history = {
+                    month: {category: stats['sum'] for category, stats in categories.items()}
+                    for month, categories in data_manager.get_month_category_summary().items()
+                }
                 with st.spinner("AI analyzing your spending patterns..."):
-                    ai_insights = ai_orchestrator.generate_insights_with_ai(filtered_df.to_dict('records'))
+                    ai_insights = ai_orchestrator.generate_insights_with_ai(
+                        filtered_df.to_dict('records'), monthly_history, health
+                    )
+                
+                if ai_insights.get('health_narrative'):
+                    st.caption(f"🏥 {ai_insights['health_narrative']}")
                 
                 if ai_insights.get('insights'):
                     for insight in ai_insights['insights']:
@@ -252,16 +367,17 @@ def main():
                     for i, rec in enumerate(ai_insights['recommendations'], 1):
                         st.success(f"{i}. {rec}")
                 
-                # Health Score
-                health_score = ai_insights.get('health_score', 70)
-                st.markdown(f"#### 🏥 Spending Health Score: {health_score}/100")
-                
-                if health_score >= 80:
-                    st.success("Excellent financial health!")
-                elif health_score >= 60:
-                    st.warning("Good, but room for improvement")
-                else:
-                    st.error("Needs attention - consider budget adjustments")
+                # Local statistical forecast
+                forecast = ai_insights.get('next_month_forecast', {})
+                if forecast.get('categories'):
+                    st.markdown(f"#### 🔮 Forecast for {forecast['month']}")
+                    st.metric(
+                        "Predicted Spending", f"${forecast['predicted_total']:.2f}",
+                        help=f"80% range: ${forecast['lower']:.2f} - ${forecast['upper']:.2f}"
+                    )
+                    forecast_df = pd.DataFrame.from_dict(forecast['categories'], orient='index')
+                    forecast_df.columns = ['Predicted', 'Low', 'High', 'Method']
+                    st.dataframe(forecast_df.sort_values('Predicted', ascending=False), use_container_width=True)
             else:
                 st.warning("No expenses found in the selected date range.")
     
@@ -291,9 +407,12 @@ def main():
             if st.button("🧠 Generate AI Budget", type="primary"):
                 if monthly_income > 0:
                     with st.spinner("AI creating your personalized budget..."):
-                        expense_history = expenses_df.to_dict('records') if not expenses_df.empty else []
+                        expense_history = data_manager.query(
+                            columns=['date', 'amount_cents', 'category']
+                        ).to_dict('records')
                         ai_budget = ai_orchestrator.generate_budget_with_ai(
-                            monthly_income, expense_history, financial_goals, risk_tolerance
+                            monthly_income, expense_history, financial_goals, risk_tolerance,
+                            data_manager.find_recurring_expenses()
                         )
                     
                     st.session_state.ai_budget = ai_budget
@@ -361,9 +480,9 @@ def main():
         if st.button("💬 Get AI Advice") and user_question:
             with st.spinner("AI advisor analyzing your question..."):
                 context = {
-                    "total_expenses": expenses_df['amount'].sum() if not expenses_df.empty else 0,
+                    "total_expenses": expenses_df['amount_cents'].sum() / 100 if not expenses_df.empty else 0,
                     "expense_count": len(expenses_df) if not expenses_df.empty else 0,
-                    "top_category": expenses_df.groupby('category')['amount'].sum().idxmax() if not expenses_df.empty else "None"
+                    "top_category": expenses_df.groupby('category')['amount_cents'].sum().idxmax() if not expenses_df.empty else "None"
                 }
                 
                 advice = ai_orchestrator.get_personalized_advice(user_question, context)
@@ -377,29 +496,71 @@ def main():
         with col1:
             st.markdown("#### Export Data")
             if not expenses_df.empty:
-                if st.button("📊 Export to CSV"):
-                    csv = expenses_df.to_csv(index=False)
-                    st.download_button(
-                        label="💾 Download CSV",
-                        data=csv,
-                        file_name=f"expenses_{datetime.now().strftime('%Y%m%d')}.csv",
-                        mime="text/csv"
-                    )
+                export_columns = st.multiselect(
+                    "Columns to export",
+                    options=EXPENSE_COLUMNS,
+                    default=EXPENSE_COLUMNS
+                )
+                compress_export = st.checkbox("Compress (gzip)")
+                extension = ".gz" if compress_export else ""
                 
-                if st.button("📋 Export to JSON"):
-                    json_data = expenses_df.to_json(orient='records', indent=2)
-                    st.download_button(
-                        label="💾 Download JSON",
-                        data=json_data,
-                        file_name=f"expenses_{datetime.now().strftime('%Y%m%d')}.json",
-                        mime="application/json"
-                    )
+                if not export_columns:
+                    st.warning("Select at least one column to export.")
+                else:
+                    if st.button("📊 Export to CSV"):
+                        export_download_button(
+                            data_manager, "csv", export_columns, compress_export, "💾 Download CSV",
+                            f"expenses_{datetime.now().strftime('%Y%m%d')}.csv{extension}",
+                            "application/gzip" if compress_export else "text/csv"
+                        )
+                    
+                    if st.button("📋 Export to JSON"):
+                        export_download_button(
+                            data_manager, "json", export_columns, compress_export, "💾 Download JSON",
+                            f"expenses_{datetime.now().strftime('%Y%m%d')}.json{extension}",
+                            "application/gzip" if compress_export else "application/json"
+                        )
             else:
                 st.info("No data to export yet.")
+            
+            st.markdown("#### Import Bank Statement")
+            statement = st.file_uploader("Upload a CSV or OFX statement", type=['csv', 'ofx', 'qfx'])
+            if statement is not None and st.button("📥 Import Statement"):
+                data = statement.getvalue()
+                if statement.name.lower().endswith('.csv'):
+                    total_rows = max(data.count(b"\n") - 1, 1)
+                else:
+                    total_rows = max(data.upper().count(b"<STMTTRN>"), 1)
+                progress_bar = st.progress(0.0, text="Importing...")
+                
+                def show_progress(rows_done):
+                    progress_bar.progress(min(rows_done / total_rows, 1.0), text=f"Imported {rows_done:,} of ~{total_rows:,} rows")
+                
+                try:
+                    result = import_bank_statement(statement.name, io.BytesIO(data), data_manager, progress_callback=show_progress)
+                    st.success(f"✅ Imported {result['imported']:,} expenses "
+                               f"({result['skipped']:,} credits skipped, {result['rejected']:,} rows rejected, "
+                               f"{result['duplicates']:,} possible duplicates)")
+                except Exception as e:
+                    st.error(f"Error importing statement: {e}")
         
         with col2:
             st.markdown("#### Data Management")
             if not expenses_df.empty:
+                duplicate_groups = data_manager.find_duplicate_expenses()
+                if duplicate_groups:
+                    extra = sum(len(group) - 1 for group in duplicate_groups)
+                    st.info(f"🔁 {extra} duplicate expense(s) found in your history")
+                    if st.button("🧹 Remove Duplicates"):
+                        removed = data_manager.remove_duplicate_expenses()
+                        st.success(f"Removed {removed} duplicate expense(s)")
+                        st.rerun()
+                
+                if data_manager.merchants is not None and st.button("🏷️ Normalize Merchant Names"):
+                    updated = data_manager.normalize_merchant_history()
+                    st.success(f"Updated {updated} expense(s) to canonical merchant names")
+                    st.rerun()
+                
                 st.warning("⚠️ Danger Zone")
                 if st.button("🗑️ Clear All Data", type="secondary"):
                     if st.checkbox("I understand this will delete all my expense data"):
@@ -416,6 +577,7 @@ def main():
             - AI-Powered Categorization  
             - Beautiful Visualizations
             - Export Capabilities
+            - Bank Statement Import
             - Budget Tracking
             """)
 
@@ -0,0 +1,24 @@
+"""Compact frame: same rows and amounts as the standard frame"""
+import pandas as pd
+
+from utils.compact_frame import from_compact_frame, to_compact_frame
+
+
+def test_missing_amounts_stay_missing():
+    expenses_df = pd.DataFrame({
+        "date": ["2025-08-18", "2025-08-19"],
+        "merchant": ["Pan Dorothy", "Ali Store"],
+        "category": ["Cafe", "Cafe"],
+        "amount_cents": pd.array([4500, None], dtype="Int64"),
+    })
+    compact_df = to_compact_frame(expenses_df)
+    assert compact_df["amount_cents"].isna().tolist() == [False, True]
+    stats = compact_df.groupby("category", observed=True)["amount_cents"].agg(["count", "mean"])
+    assert stats.loc["Cafe"].tolist() == [1, 4500]
+    assert from_compact_frame(compact_df)["amount"].isna().tolist() == [False, True]
+
+
+def test_legacy_amounts_convert_like_to_cents():
+    compact_df = to_compact_frame(pd.DataFrame({"amount": [0.125, "$12.50", None]}))
+    assert compact_df["amount_cents"].tolist()[:2] == [13, 1250]
+    assert pd.isna(compact_df["amount_cents"].iat[2])
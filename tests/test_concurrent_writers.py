@@ -0,0 +1,87 @@
+"""Stress test: concurrent writer processes on every backend lose no updates"""
+import multiprocessing
+import os
+
+import pytest
+
+from utils.data_manager import DataManager
+
+WRITERS = 8
+INSERTS = 40
+# Every UPDATE_EVERY-th insert of a writer is later updated by that writer
+UPDATE_EVERY = 5
+
+BACKENDS = {
+    "json": {},
+    "journal": {"journal": True, "compact_threshold": 25},
+    "journal_background": {"journal": True, "compact_threshold": 25, "compaction_interval": 0.05},
+    "write_behind": {"flush_interval": 0.05},
+    "sqlite": {"backend": "sqlite"},
+    "partitioned": {"backend": "partitioned"},
+}
+
+
+def make_manager(directory, options):
+    return DataManager(
+        data_file=os.path.join(directory, "expenses.json"),
+        db_file=os.path.join(directory, "expenses.db"),
+        partition_dir=os.path.join(directory, "partitions"),
+        normalize_merchants=False,
+        **options
+    )
+
+
+def write_expenses(directory, options, writer):
+    """Insert INSERTS expenses, then update some of them, as one writer process"""
+    data_manager = make_manager(directory, options)
+    merchant = f"Writer {writer}"
+    for i in range(INSERTS):
+        data_manager.add_expense({
+            "date": f"2025-{i % 12 + 1:02d}-{writer + 1:02d}",
+            "merchant": merchant,
+            "amount": writer * 1000 + i + 0.25,
+            "category": "Other",
+            "items": [f"item {i}"],
+            "description": f"{writer}:{i}",
+        })
+    expenses_df = data_manager.query(merchants=[merchant], columns=["id", "description"])
+    for expense_id, description in zip(expenses_df["id"], expenses_df["description"]):
+        if int(description.split(":")[1]) % UPDATE_EVERY == 0:
+            data_manager.update_expense_by_id(expense_id, {"category": "Updated"})
+    data_manager.close()
+
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_concurrent_writers_lose_no_updates(tmp_path, backend):
+    directory = str(tmp_path)
+    options = BACKENDS[backend]
+    # Create the storage once up front so writers do not race on initialization
+    make_manager(directory, options).close()
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=write_expenses, args=(directory, options, writer))
+        for writer in range(WRITERS)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    data_manager = make_manager(directory, options)
+    expenses_df = data_manager.load_expenses()
+    data_manager.close()
+
+    assert len(expenses_df) == WRITERS * INSERTS
+    assert expenses_df["id"].is_unique
+    assert set(expenses_df["description"]) == {
+        f"{writer}:{i}" for writer in range(WRITERS) for i in range(INSERTS)
+    }
+    updated = expenses_df.loc[expenses_df["category"] == "Updated", "description"]
+    assert set(updated) == {
+        f"{writer}:{i}" for writer in range(WRITERS) for i in range(0, INSERTS, UPDATE_EVERY)
+    }
+    assert expenses_df["amount_cents"].sum() == sum(
+        (writer * 1000 + i) * 100 + 25 for writer in range(WRITERS) for i in range(INSERTS)
+    )
@@ -0,0 +1,43 @@
+"""Duplicate detection: re-uploaded receipts vs. repeated purchases"""
+from datetime import date, timedelta
+
+import pandas as pd
+
+from utils.duplicates import DuplicateIndex, find_duplicate_groups
+
+
+def expense(expense_id, day, merchant="Pan Dorothy", cents=4500, items="Ice Americano, Ice Cappuccino"):
+    return {"id": expense_id, "date": day, "merchant": merchant, "amount_cents": cents, "items": items}
+
+
+def daily_fares(days):
+    start = date(2025, 1, 1)
+    return [
+        expense(f"fare{i}", (start + timedelta(days=i)).isoformat(), "MTA Subway", 290, "Fare")
+        for i in range(days)
+    ]
+
+
+def test_reupload_with_misread_date_is_a_duplicate():
+    records = [expense("late", "2025-08-28"), expense("early", "2025-08-18")]
+    assert find_duplicate_groups(pd.DataFrame(records)) == [["early", "late"]]
+    index = DuplicateIndex.from_records(records[:1])
+    assert index.find(records[1]) == ["late"]
+
+
+def test_repeated_daily_purchase_is_not_a_duplicate():
+    assert find_duplicate_groups(pd.DataFrame(daily_fares(28))) == []
+    index = DuplicateIndex.from_records(daily_fares(28)[:-1])
+    assert index.find(daily_fares(28)[-1]) == []
+
+
+def test_unitemized_rows_only_match_on_the_same_date():
+    records = [
+        expense("a", "2025-03-01", "Coffee Bar", 350, ""),
+        expense("b", "2025-03-01", "Coffee Bar", 350, ""),
+        expense("c", "2025-03-02", "Coffee Bar", 350, ""),
+    ]
+    assert find_duplicate_groups(pd.DataFrame(records)) == [["a", "b"]]
+    index = DuplicateIndex.from_records(records[:1])
+    assert index.find(records[1]) == ["a"]
+    assert index.find(records[2]) == []
@@ -0,0 +1,22 @@
+"""Stable ids: every stored expense gets one, whichever way it was saved"""
+import json
+
+import pandas as pd
+
+from utils.data_manager import DataManager
+
+
+def test_save_expenses_gives_new_frame_rows_an_id(tmp_path):
+    data_file = tmp_path / "expenses.json"
+    data_manager = DataManager(data_file=str(data_file))
+    data_manager.add_expense({"date": "2025-08-18", "merchant": "Pan Dorothy", "amount": 45, "category": "Cafe"})
+    new_row = {"date": "2025-08-19", "merchant": "Ali Store", "amount": 12.5, "category": "Groceries"}
+
+    assert data_manager.save_expenses(pd.concat([data_manager.load_expenses(), pd.DataFrame([new_row])]))
+
+    with open(data_file) as f:
+        records = json.load(f)
+    ids = [record["id"] for record in records]
+    assert len(ids) == 2
+    assert all(isinstance(expense_id, str) and expense_id for expense_id in ids)
+    assert len(set(ids)) == 2
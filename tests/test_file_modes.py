@@ -0,0 +1,42 @@
+"""Atomic rewrites keep the permissions of the files they replace"""
+import os
+import stat
+
+import pytest
+
+from utils.data_manager import DataManager
+from utils.file_modes import _UMASK
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason="POSIX permissions")
+
+EXPENSE = {"date": "2025-08-18", "merchant": "Pan Dorothy", "amount": 45, "category": "Cafe"}
+
+
+def mode_of(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_snapshot_gets_the_default_file_mode(tmp_path):
+    data_file = str(tmp_path / "expenses.json")
+    DataManager(data_file=data_file).add_expense(dict(EXPENSE))
+    assert mode_of(data_file) == 0o666 & ~_UMASK
+
+
+@pytest.mark.parametrize("mode", [0o644, 0o640])
+def test_rewrite_keeps_the_existing_mode(tmp_path, mode):
+    data_file = str(tmp_path / "expenses.json")
+    data_manager = DataManager(data_file=data_file)
+    os.chmod(data_file, mode)
+    data_manager.add_expense(dict(EXPENSE))
+    assert mode_of(data_file) == mode
+
+
+def test_partition_files_keep_the_existing_mode(tmp_path):
+    partition_dir = tmp_path / "partitions"
+    data_manager = DataManager(data_file=str(tmp_path / "expenses.json"),
+                               backend="partitioned", partition_dir=str(partition_dir))
+    data_manager.add_expense(dict(EXPENSE))
+    manifest = str(partition_dir / "manifest.json")
+    os.chmod(manifest, 0o644)
+    data_manager.add_expense(dict(EXPENSE, date="2025-09-01"))
+    assert mode_of(manifest) == 0o644
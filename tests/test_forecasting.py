@@ -0,0 +1,17 @@
+"""Local forecast: anchored on today, on complete months only"""
+from utils.forecasting import forecast_next_month
+
+
+def test_running_month_does_not_drag_the_forecast_down():
+    history = {f"2025-{month:02d}": {"Food": 1000.0} for month in range(1, 10)}
+    history["2025-10"] = {"Food": 300.0}
+    forecast = forecast_next_month(history, today="2025-10-16")
+    assert forecast["month"] == "2025-11"
+    assert forecast["predicted_total"] == 1000.0
+
+
+def test_quiet_months_up_to_today_count_as_zero():
+    history = {f"2025-{month:02d}": {"Food": 1000.0} for month in range(1, 6)}
+    forecast = forecast_next_month(history, today="2025-10-16")
+    assert forecast["month"] == "2025-11"
+    assert forecast["predicted_total"] < 1000.0
@@ -0,0 +1,32 @@
+"""add_expense and add_expenses accept and reject the same records"""
+import pytest
+
+from utils.data_manager import DataManager
+
+VALID = {"date": "2025-08-18", "merchant": "Pan Dorothy", "amount": 45, "category": "Cafe"}
+
+
+@pytest.mark.parametrize("changes", [
+    {},
+    {"amount": "$1,234.50"},
+    {"date": "2025-8-3"},
+    {"merchant": ""},
+    {"merchant": None},
+    {"amount": -5},
+    {"amount": "abc"},
+    {"amount": None},
+    {"date": "not a date"},
+])
+def test_single_and_bulk_inserts_agree(tmp_path, changes):
+    record = dict(VALID, **changes)
+    single = DataManager(data_file=str(tmp_path / "single.json"))
+    bulk = DataManager(data_file=str(tmp_path / "bulk.json"))
+
+    added = single.add_expense(dict(record))
+    result = bulk.add_expenses([dict(record)])[0]
+
+    assert added == (result["error"] is None)
+    assert len(single.load_expenses()) == len(bulk.load_expenses()) == int(added)
+    if added:
+        stored = single.load_expenses()[["date", "amount_cents"]].to_dict("records")
+        assert stored == bulk.load_expenses()[["date", "amount_cents"]].to_dict("records")
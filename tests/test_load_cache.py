@@ -0,0 +1,21 @@
+"""load_expenses cache: frames handed out cannot change the cache"""
+from utils.data_manager import DataManager
+
+
+def make_manager(tmp_path):
+    data_manager = DataManager(data_file=str(tmp_path / "expenses.json"))
+    data_manager.add_expense({"date": "2025-08-18", "merchant": "Pan Dorothy", "amount": 45, "category": "Cafe"})
+    return data_manager
+
+
+def test_in_place_edits_do_not_reach_the_cache(tmp_path):
+    data_manager = make_manager(tmp_path)
+    expenses_df = data_manager.load_expenses()
+    expenses_df.loc[expenses_df.index[0], "merchant"] = "Changed"
+    expenses_df.iloc[0, expenses_df.columns.get_loc("amount_cents")] = 1
+    assert data_manager.load_expenses()["merchant"].tolist() == ["Pan Dorothy"]
+    assert data_manager.load_expenses()["amount_cents"].tolist() == [4500]
+
+    projected = data_manager.load_expenses(columns=["merchant", "amount"])
+    projected.loc[projected.index[0], "merchant"] = "Changed"
+    assert data_manager.load_expenses(columns=["merchant", "amount"])["merchant"].tolist() == ["Pan Dorothy"]
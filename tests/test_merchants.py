@@ -0,0 +1,37 @@
+"""Merchant normalization: OCR spellings merge, distinct merchants do not"""
+import pytest
+
+from utils.merchants import MerchantDictionary
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Uber", "Uber Eats"),
+    ("Amazon", "Amazon Prime"),
+    ("Apple", "Apple Store"),
+    ("Shell", "Shell Oil"),
+    ("Studio 54", "Studio 8"),
+])
+def test_distinct_merchants_are_not_aliased(tmp_path, first, second):
+    merchants = MerchantDictionary(str(tmp_path / "merchants.json"))
+    assert merchants.resolve(first) == first
+    assert merchants.resolve(second) == second
+
+
+@pytest.mark.parametrize("canonical, spelling", [
+    ("Ali Store", "Ali  St0re"),
+    ("Walmart", "WALMART #12"),
+])
+def test_ocr_spellings_resolve_to_canonical_name(tmp_path, canonical, spelling):
+    merchants = MerchantDictionary(str(tmp_path / "merchants.json"))
+    merchants.resolve(canonical)
+    assert merchants.resolve(spelling) == canonical
+
+
+def test_save_merges_entries_saved_by_another_writer(tmp_path):
+    path = str(tmp_path / "merchants.json")
+    first, second = MerchantDictionary(path), MerchantDictionary(path)
+    first.resolve("Foo Market")
+    first.save()
+    second.resolve("Bar Deli")
+    second.save()
+    assert set(MerchantDictionary(path).canonical) == {"Foo Market", "Bar Deli"}
@@ -0,0 +1,16 @@
+"""Integer cents: both insert paths store the same cents"""
+import pandas as pd
+import pytest
+
+from utils.money import cents_series, to_cents
+
+
+@pytest.mark.parametrize("amount", [0.125, 1.005, -2.675, "$12.50", "1,234.50", " 7 ", 3, "4.5"])
+def test_cents_series_matches_to_cents(amount):
+    assert cents_series(pd.Series([amount], dtype=object)).iat[0] == to_cents(amount)
+
+
+def test_cents_series_marks_non_numeric_amounts_missing():
+    cents = cents_series(pd.Series([None, float("nan"), "abc", 1.5], dtype=object))
+    assert cents.isna().tolist() == [True, True, True, False]
+    assert str(cents.dtype) == "Int64"
@@ -0,0 +1,19 @@
+"""Tenant sharding: every tenant id gets its own ledger directory"""
+from utils.tenants import TenantRegistry, ledger_tenant, tenant_directory_name, user_tenant
+
+
+def test_directory_names_do_not_collide():
+    tenant_ids = ["Alice@x.com", "alice_x.com", "ALICE@X.COM",
+                  user_tenant("alice@x.com"), ledger_tenant("alice@x.com")]
+    names = {tenant_directory_name(tenant_id) for tenant_id in tenant_ids}
+    assert len({name.lower() for name in names}) == len(tenant_ids)
+
+
+def test_typed_ledger_name_does_not_open_a_users_ledger(tmp_path):
+    tenants = TenantRegistry(base_dir=str(tmp_path), legacy_file=None)
+    tenants.get(user_tenant("alice@x.com")).add_expense(
+        {"date": "2025-08-18", "merchant": "Pan Dorothy", "amount": 45, "category": "Cafe"}
+    )
+    assert tenants.get(ledger_tenant("alice@x.com")).load_expenses().empty
+    assert len(tenants.get(user_tenant("alice@x.com")).load_expenses()) == 1
+    tenants.close()
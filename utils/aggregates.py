@@ -0,0 +1,123 @@
+import pandas as pd
+
+from utils.money import cents_of
+
+# Groupings kept by ExpenseAggregates and the record fields they key on
+GROUPINGS = ('category', 'month', 'month_category')
+
+
+def month_of(date):
+    """YYYY-MM month of a date value"""
+    if isinstance(date, str) and len(date) >= 7 and date[4] == '-' and date[:4].isdigit() and date[5:7].isdigit():
+        return date[:7]
+    return pd.to_datetime(date).strftime('%Y-%m')
+
+
+def group_keys(record):
+    """Key of a record in every grouping"""
+    category = record.get('category', 'Other')
+    month = month_of(record.get('date'))
+    return {'category': category, 'month': month, 'month_category': (month, category)}
+
+
+class GroupStats:
+    """Running sum, count, min and max of one group, in integer cents"""
+
+    __slots__ = ('sum', 'count', 'min', 'max', 'stale')
+
+    def __init__(self, total=0, count=0, minimum=None, maximum=None):
+        self.sum = total
+        self.count = count
+        self.min = minimum
+        self.max = maximum
+        # Set when the current min or max was removed; refreshed lazily
+        self.stale = False
+
+    def add(self, amount):
+        self.sum += amount
+        self.count += 1
+        if self.min is None or amount < self.min:
+            self.min = amount
+        if self.max is None or amount > self.max:
+            self.max = amount
+
+    def remove(self, amount):
+        self.sum -= amount
+        self.count -= 1
+        if amount == self.min or amount == self.max:
+            self.stale = True
+
+    def as_dict(self):
+        """Stats in currency units; the only place cents are converted back"""
+        return {
+            'sum': self.sum / 100,
+            'count': self.count,
+            'mean': self.sum / self.count / 100 if self.count else 0.0,
+            'min': self.min / 100 if self.min is not None else None,
+            'max': self.max / 100 if self.max is not None else None,
+        }
+
+
+class ExpenseAggregates:
+    """Incrementally maintained spending stats per category, month and (month, category)
+
+    Amounts are kept as integer cents, so sums are exact. add() and
+    remove() are O(1). Removing the current min or max of a group only
+    marks it stale; summary() asks the caller for fresh extremes of that
+    one group through its refresh callback.
+    """
+
+    def __init__(self):
+        self.groups = {grouping: {} for grouping in GROUPINGS}
+
+    @classmethod
+    def from_records(cls, records):
+        """Build aggregates by folding over stored records"""
+        aggregates = cls()
+        for record in records:
+            aggregates.add(record)
+        return aggregates
+
+    @classmethod
+    def from_group_stats(cls, rows):
+        """Build aggregates from precomputed (grouping, key, sum, count, min, max) rows in cents"""
+        aggregates = cls()
+        for grouping, key, total, count, minimum, maximum in rows:
+            aggregates.groups[grouping][key] = GroupStats(int(total), count, minimum, maximum)
+        return aggregates
+
+    def add(self, record):
+        amount = cents_of(record)
+        if amount is None:
+            return
+        for grouping, key in group_keys(record).items():
+            stats = self.groups[grouping].get(key)
+            if stats is None:
+                stats = self.groups[grouping][key] = GroupStats()
+            stats.add(amount)
+
+    def remove(self, record):
+        amount = cents_of(record)
+        if amount is None:
+            return
+        for grouping, key in group_keys(record).items():
+            stats = self.groups[grouping].get(key)
+            if stats is None:
+                continue
+            stats.remove(amount)
+            if stats.count <= 0:
+                del self.groups[grouping][key]
+
+    def summary(self, grouping, refresh):
+        """{key: stats dict} for a grouping
+
+        refresh(grouping, key) must return the (min, max) cents of a group
+        and is only called for groups whose extremes went stale.
+        """
+        result = {}
+        for key, stats in self.groups[grouping].items():
+            if stats.stale:
+                stats.min, stats.max = refresh(grouping, key)
+                stats.stale = False
+            result[key] = stats.as_dict()
+        return result
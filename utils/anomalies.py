@@ -0,0 +1,191 @@
+import math
+import numpy as np
+import pandas as pd
+
+from utils.money import cents_of, cents_series
+
+# Columns needed to score expenses against their category history
+ANOMALY_COLUMNS = ['id', 'date', 'merchant', 'amount_cents', 'category', 'timestamp']
+
+# Smallest spread assumed for a category, in log amount (about 25%), so a
+# category of identical charges does not flag every small price change
+MIN_SPREAD = math.log(1.25)
+# Spreads from both the mean and the EWMA beyond which an expense is flagged
+THRESHOLD = 3.5
+
+
+def log_amount(cents):
+    """Log of an amount in cents; amounts are compared by ratio, not difference"""
+    return math.log(max(cents, 1))
+
+
+class CategoryState:
+    """Running count, mean and variance (Welford) and EWMA of one category's log amounts"""
+
+    __slots__ = ('count', 'mean', 'm2', 'ewma', 'ewm_var')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, ewma=0.0, ewm_var=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.ewma = ewma
+        self.ewm_var = ewm_var
+
+    def add(self, value, alpha):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.count == 1:
+            self.ewma = value
+            self.ewm_var = 0.0
+        else:
+            diff = value - self.ewma
+            increment = alpha * diff
+            self.ewma += increment
+            self.ewm_var = (1 - alpha) * (self.ewm_var + diff * increment)
+
+    def spread(self):
+        variance = self.m2 / (self.count - 1) if self.count > 1 else 0.0
+        return max(math.sqrt(variance), MIN_SPREAD)
+
+    def ewm_spread(self):
+        return max(math.sqrt(self.ewm_var), MIN_SPREAD)
+
+
+class AnomalyDetector:
+    """Streaming per-category outlier detector over log amounts
+
+    Each category keeps a running mean and variance and an exponentially
+    weighted mean and variance (alpha), updated in O(1) per expense. An
+    expense is anomalous when its category has at least min_history
+    expenses and its amount is more than threshold spreads away from both
+    the long-run mean and the recent EWMA, so a category whose level has
+    shifted does not keep flagging. Flagged expenses still update the
+    state: a saved amount is taken as confirmed.
+    """
+
+    def __init__(self, threshold=THRESHOLD, alpha=0.1, min_history=5):
+        self.threshold = threshold
+        self.alpha = alpha
+        self.min_history = min_history
+        self.categories = {}
+
+    def score(self, record):
+        """Score a record against the current state without adding it
+
+        Returns None when it cannot be scored yet, else {'zscore',
+        'ewma_zscore', 'expected', 'anomalous'} with expected the typical
+        recent amount of the category in currency units.
+        """
+        cents = cents_of(record)
+        state = self.categories.get(record.get('category', 'Other'))
+        if cents is None or state is None or state.count < self.min_history:
+            return None
+        value = log_amount(cents)
+        zscore = (value - state.mean) / state.spread()
+        ewma_zscore = (value - state.ewma) / state.ewm_spread()
+        return {
+            'zscore': round(zscore, 2),
+            'ewma_zscore': round(ewma_zscore, 2),
+            'expected': round(math.exp(state.ewma) / 100, 2),
+            'anomalous': abs(zscore) > self.threshold and abs(ewma_zscore) > self.threshold,
+        }
+
+    def add(self, record):
+        cents = cents_of(record)
+        if cents is None:
+            return
+        category = record.get('category', 'Other')
+        state = self.categories.get(category)
+        if state is None:
+            state = self.categories[category] = CategoryState()
+        state.add(log_amount(cents), self.alpha)
+
+    def observe(self, record):
+        """Score a record, then add it; returns the score"""
+        result = self.score(record)
+        self.add(record)
+        return result
+
+    @classmethod
+    def from_frame(cls, expenses_df, threshold=THRESHOLD, alpha=0.1, min_history=5):
+        """Build a detector holding the state after every expense of a frame"""
+        detector = cls(threshold, alpha, min_history)
+        score_history(expenses_df, threshold, alpha, min_history, final_state=detector.categories)
+        return detector
+
+
+def _ordered_history(expenses_df):
+    """Frame of category, log amount and original row position, in ledger order"""
+    cents = (expenses_df['amount_cents'] if 'amount_cents' in expenses_df
+             else cents_series(expenses_df['amount']))
+    df = pd.DataFrame({
+        'row': np.arange(len(expenses_df)),
+        'category': expenses_df['category'].astype(object).fillna('Other').values,
+        'cents': pd.to_numeric(cents, errors='coerce').astype('float64').values,
+        'date': pd.to_datetime(expenses_df['date'], errors='coerce').values,
+        'timestamp': expenses_df['timestamp'].astype(object).values if 'timestamp' in expenses_df else '',
+    }).dropna(subset=['cents'])
+    df['value'] = np.log(np.maximum(df['cents'].to_numpy(), 1))
+    return df.sort_values(['date', 'timestamp'], kind='stable', na_position='first')
+
+
+def score_history(expenses_df, threshold=THRESHOLD, alpha=0.1, min_history=5, final_state=None):
+    """Score every expense of a frame against its category's earlier expenses
+
+    The vectorized equivalent of feeding the frame to AnomalyDetector.observe
+    in date order: prior means and variances come from grouped cumulative
+    sums and the EWMA from a grouped exponential window. Returns a frame
+    aligned with expenses_df with zscore, ewma_zscore, expected and
+    anomalous columns (NaN / False where a row cannot be scored). When
+    final_state is a dict it is filled with the CategoryState of every
+    category after the last expense.
+    """
+    df = _ordered_history(expenses_df)
+    grouped = df.groupby('category', sort=False)['value']
+    count = grouped.cumcount().to_numpy()
+    value = df['value'].to_numpy()
+    prior_sum = grouped.cumsum().to_numpy() - value
+    prior_squares = (df['value'] ** 2).groupby(df['category'], sort=False).cumsum().to_numpy() - value ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prior_mean = prior_sum / count
+        prior_var = (prior_squares - count * prior_mean ** 2) / (count - 1)
+    spread = np.maximum(np.sqrt(np.where(count > 1, np.maximum(prior_var, 0.0), 0.0)), MIN_SPREAD)
+
+    ewma = grouped.transform(lambda s: s.ewm(alpha=alpha, adjust=False).mean())
+    ewm_var = grouped.transform(lambda s: s.ewm(alpha=alpha, adjust=False).var(bias=True)).fillna(0.0)
+    prior_ewma = ewma.groupby(df['category'], sort=False).shift().to_numpy()
+    prior_ewm_var = ewm_var.groupby(df['category'], sort=False).shift().to_numpy()
+    ewm_spread = np.maximum(np.sqrt(np.maximum(prior_ewm_var, 0.0)), MIN_SPREAD)
+
+    scored = count >= min_history
+    zscore = np.where(scored, (value - prior_mean) / spread, np.nan)
+    ewma_zscore = np.where(scored, (value - prior_ewma) / ewm_spread, np.nan)
+    anomalous = scored & (np.abs(zscore) > threshold) & (np.abs(ewma_zscore) > threshold)
+
+    if final_state is not None:
+        last = df.assign(ewma=ewma.to_numpy(), ewm_var=ewm_var.to_numpy(), seen=count + 1)
+        sums = df.groupby('category', sort=False)['value'].agg(['mean', 'var'])
+        for row in last.groupby('category', sort=False).tail(1).itertuples():
+            n = int(row.seen)
+            variance = sums.at[row.category, 'var']
+            final_state[row.category] = CategoryState(
+                n, float(sums.at[row.category, 'mean']),
+                float(variance * (n - 1)) if n > 1 else 0.0, float(row.ewma), float(row.ewm_var)
+            )
+
+    # Scatter the scores back to the frame's own row order
+    positions = df['row'].to_numpy()
+    columns = {
+        'zscore': np.round(zscore, 2),
+        'ewma_zscore': np.round(ewma_zscore, 2),
+        'expected': np.where(scored, np.round(np.exp(prior_ewma) / 100, 2), np.nan),
+    }
+    result = {}
+    for name, values in columns.items():
+        result[name] = np.full(len(expenses_df), np.nan)
+        result[name][positions] = values
+    result['anomalous'] = np.zeros(len(expenses_df), dtype=bool)
+    result['anomalous'][positions] = anomalous
+    return pd.DataFrame(result, index=expenses_df.index)
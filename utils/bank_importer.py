@@ -0,0 +1,192 @@
+import io
+import re
+import pandas as pd
+
+# Keyword rules for local categorization; the first matching category wins
+CATEGORY_RULES = {
+    'Groceries': ['grocery', 'supermarket', 'market', 'walmart', 'aldi', 'kroger', 'whole foods', 'lidl'],
+    'Food & Dining': ['restaurant', 'cafe', 'coffee', 'starbucks', 'mcdonald', 'pizza', 'burger', 'doordash', 'ubereats'],
+    'Transportation': ['uber', 'lyft', 'shell', 'chevron', 'fuel', 'gas station', 'parking', 'transit', 'airline'],
+    'Utilities': ['electric', 'water', 'internet', 'comcast', 'verizon', 'at&t', 'utility', 'phone'],
+    'Entertainment': ['netflix', 'spotify', 'cinema', 'theatre', 'steam', 'hulu', 'disney'],
+    'Healthcare': ['pharmacy', 'cvs', 'walgreens', 'clinic', 'hospital', 'dental', 'doctor'],
+    'Shopping': ['amazon', 'target', 'ebay', 'ikea', 'store', 'shop'],
+}
+
+# Header names recognised for each schema field (compared case-insensitively)
+COLUMN_ALIASES = {
+    'date': ['date', 'transaction date', 'posted date', 'posting date', 'booking date', 'value date'],
+    'description': ['description', 'payee', 'merchant', 'name', 'details', 'memo', 'narrative'],
+    'amount': ['amount', 'transaction amount', 'value'],
+    'debit': ['debit', 'withdrawal', 'withdrawals', 'money out', 'paid out'],
+    'credit': ['credit', 'deposit', 'deposits', 'money in', 'paid in'],
+}
+
+OFX_FIELDS = ['TRNTYPE', 'DTPOSTED', 'TRNAMT', 'NAME', 'MEMO']
+
+
+def detect_columns(columns):
+    """Map schema fields to CSV header names using COLUMN_ALIASES"""
+    lowered = {str(col).strip().lower(): col for col in columns}
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                mapping[field] = lowered[alias]
+                break
+    return mapping
+
+
+def parse_amounts(values):
+    """Parse amount strings like '$1,234.50', '-12.00' or '(12.00)' to floats"""
+    text = values.astype(str).str.strip()
+    negative = text.str.startswith('(') & text.str.endswith(')')
+    cleaned = text.str.replace(r'[^\d.\-]', '', regex=True)
+    amounts = pd.to_numeric(cleaned, errors='coerce')
+    return amounts.where(~negative, -amounts.abs())
+
+
+def clean_merchants(descriptions):
+    """Normalize whitespace and drop trailing reference numbers from descriptions"""
+    return (
+        descriptions.fillna('Unknown').astype(str)
+        .str.replace(r'\s+', ' ', regex=True)
+        .str.replace(r'\s*#?\d{4,}$', '', regex=True)
+        .str.strip()
+        .replace('', 'Unknown')
+    )
+
+
+def categorize(merchants, rules=None):
+    """Assign a category to every merchant with keyword rules, 'Other' by default"""
+    rules = rules or CATEGORY_RULES
+    lowered = merchants.str.lower()
+    categories = pd.Series('Other', index=merchants.index, dtype=object)
+    unassigned = pd.Series(True, index=merchants.index)
+    for category, keywords in rules.items():
+        pattern = '|'.join(re.escape(keyword.lower()) for keyword in keywords)
+        matches = unassigned & lowered.str.contains(pattern, regex=True)
+        categories[matches] = category
+        unassigned &= ~matches
+    return categories
+
+
+def to_expense_frame(chunk, mapping, date_format=None, dayfirst=False, rules=None,
+                     expenses_are_negative=True):
+    """Map a raw statement chunk onto expense records
+
+    Returns (expenses DataFrame, number of non-expense rows skipped). With a
+    single signed amount column, outflows are the negative amounts unless
+    expenses_are_negative is False; with debit/credit columns the debit
+    column is used.
+    """
+    if 'debit' in mapping:
+        amounts = parse_amounts(chunk[mapping['debit']]).abs()
+    else:
+        amounts = parse_amounts(chunk[mapping['amount']])
+        amounts = -amounts if expenses_are_negative else amounts
+    is_expense = amounts > 0
+
+    dates = pd.to_datetime(chunk[mapping['date']], errors='coerce', format=date_format, dayfirst=dayfirst)
+    descriptions = chunk[mapping['description']] if 'description' in mapping else pd.Series('Unknown', index=chunk.index)
+    merchants = clean_merchants(descriptions)
+
+    frame = pd.DataFrame({
+        'merchant': merchants,
+        # Rounded to cents by add_expenses, the same way as add_expense
+        'amount': amounts,
+        'date': dates.dt.strftime('%Y-%m-%d'),
+        'items': '',
+        'category': categorize(merchants, rules),
+        'description': descriptions.fillna('').astype(str).str.strip(),
+    })
+    frame = frame[is_expense.fillna(False)]
+    return frame, int((~is_expense.fillna(False)).sum())
+
+
+def _persist(data_manager, frame, summary):
+    results = data_manager.add_expenses(frame.to_dict('records'))
+    imported = sum(1 for result in results if result['id'] is not None)
+    summary['imported'] += imported
+    summary['rejected'] += len(results) - imported
+    summary['duplicates'] += sum(1 for result in results if result['duplicate_of'] is not None)
+
+
+def import_bank_csv(source, data_manager, column_map=None, chunksize=50000, date_format=None,
+                    dayfirst=False, rules=None, expenses_are_negative=True, progress_callback=None):
+    """Import a bank CSV export into data_manager in chunks
+
+    source is a path or file-like object. column_map overrides detected
+    headers, e.g. {'date': 'Booked', 'description': 'Text', 'amount': 'Sum'}.
+    progress_callback(rows_processed) is called after every chunk.
+
+    Returns {'imported': n, 'rejected': n, 'duplicates': n, 'skipped': n,
+    'rows': n}.
+    """
+    summary = {'imported': 0, 'rejected': 0, 'duplicates': 0, 'skipped': 0, 'rows': 0}
+    mapping = None
+    for chunk in pd.read_csv(source, chunksize=chunksize, dtype=str, skipinitialspace=True):
+        if mapping is None:
+            mapping = detect_columns(chunk.columns)
+            mapping.update(column_map or {})
+            if 'date' not in mapping or not ({'amount', 'debit'} & set(mapping)):
+                raise ValueError(f"Could not find date and amount columns in {list(chunk.columns)}")
+
+        frame, skipped = to_expense_frame(chunk, mapping, date_format, dayfirst, rules, expenses_are_negative)
+        _persist(data_manager, frame, summary)
+        summary['skipped'] += skipped
+        summary['rows'] += len(chunk)
+        if progress_callback:
+            progress_callback(summary['rows'])
+    return summary
+
+
+def parse_ofx(text):
+    """Parse the STMTTRN transactions of an OFX/QFX document into a DataFrame"""
+    blocks = re.findall(r'<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|(?=</BANKTRANLIST>))', text,
+                        flags=re.DOTALL | re.IGNORECASE)
+    blocks = pd.Series(blocks, dtype=object)
+    frame = pd.DataFrame(index=blocks.index)
+    for field in OFX_FIELDS:
+        # SGML-style OFX leaves tags unclosed, so values run to the next tag
+        frame[field] = blocks.str.extract(rf'<{field}>([^<\r\n]*)', flags=re.IGNORECASE)[0].str.strip()
+    frame['DTPOSTED'] = frame['DTPOSTED'].str[:8]
+    return frame
+
+
+def import_bank_ofx(source, data_manager, chunksize=50000, rules=None, progress_callback=None):
+    """Import an OFX/QFX statement into data_manager in chunks
+
+    OFX amounts are signed, with outflows negative. Returns the same summary
+    as import_bank_csv.
+    """
+    if hasattr(source, 'read'):
+        text = source.read()
+        if isinstance(text, bytes):
+            text = text.decode('utf-8', errors='replace')
+    else:
+        with open(source, 'r', errors='replace') as f:
+            text = f.read()
+
+    transactions = parse_ofx(text)
+    transactions['DESCRIPTION'] = transactions['NAME'].fillna(transactions['MEMO'])
+    mapping = {'date': 'DTPOSTED', 'description': 'DESCRIPTION', 'amount': 'TRNAMT'}
+    summary = {'imported': 0, 'rejected': 0, 'duplicates': 0, 'skipped': 0, 'rows': 0}
+    for start in range(0, len(transactions), chunksize):
+        chunk = transactions.iloc[start:start + chunksize]
+        frame, skipped = to_expense_frame(chunk, mapping, date_format='%Y%m%d', rules=rules)
+        _persist(data_manager, frame, summary)
+        summary['skipped'] += skipped
+        summary['rows'] += len(chunk)
+        if progress_callback:
+            progress_callback(summary['rows'])
+    return summary
+
+
+def import_bank_statement(file_name, source, data_manager, **kwargs):
+    """Import a statement, choosing the parser from the file extension"""
+    if file_name.lower().endswith(('.ofx', '.qfx')):
+        return import_bank_ofx(source, data_manager, **kwargs)
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return import_bank_csv(source, data_manager, **kwargs)
@@ -0,0 +1,67 @@
+import pandas as pd
+
+from utils.money import cents_series
+
+
+def to_compact_frame(expenses_df):
+    """Convert a load_expenses frame to the compact typed schema
+
+    - date: datetime64[s] (the coarsest resolution pandas supports)
+    - category, merchant: categorical
+    - amount: dropped in favour of amount_cents, nullable Int64 (expenses
+      without a numeric amount stay <NA>, as in the standard frame)
+    """
+    df = pd.DataFrame(index=expenses_df.index)
+    for column in expenses_df.columns:
+        values = expenses_df[column]
+        if column == 'date':
+            df['date'] = pd.to_datetime(values).astype('datetime64[s]')
+        elif column in ('category', 'merchant'):
+            df[column] = values.astype('category')
+        elif column == 'amount_cents':
+            df['amount_cents'] = values.astype('Int64')
+        elif column == 'amount':
+            if 'amount_cents' not in expenses_df.columns:
+                df['amount_cents'] = cents_series(values)
+        else:
+            df[column] = values
+    return df
+
+
+def from_compact_frame(compact_df):
+    """Convert a compact frame back to the load_expenses schema"""
+    df = pd.DataFrame(index=compact_df.index)
+    for column in compact_df.columns:
+        values = compact_df[column]
+        if column == 'date':
+            df['date'] = values.dt.strftime('%Y-%m-%d')
+        elif column in ('category', 'merchant'):
+            df[column] = values.astype(object)
+        elif column == 'amount_cents':
+            df['amount'] = values.astype('float64') / 100
+            df['amount_cents'] = values
+        else:
+            df[column] = values
+    return df
+
+
+def memory_report(expenses_df, compact_df=None):
+    """Deep memory usage of a frame in standard vs compact schema
+
+    Returns per-column and total bytes of both frames and the reduction
+    ratio of the compact one (0.6 means 60% smaller).
+    """
+    if compact_df is None:
+        compact_df = to_compact_frame(expenses_df)
+    standard = expenses_df.memory_usage(deep=True, index=False)
+    compact = compact_df.memory_usage(deep=True, index=False)
+    standard_total = int(standard.sum())
+    compact_total = int(compact.sum())
+    return {
+        'rows': len(expenses_df),
+        'standard_bytes': standard_total,
+        'compact_bytes': compact_total,
+        'reduction': 1 - compact_total / standard_total if standard_total else 0.0,
+        'standard_columns': {col: int(size) for col, size in standard.items()},
+        'compact_columns': {col: int(size) for col, size in compact.items()},
+    }
@@ -1,120 +1,1314 @@
 import pandas as pd
 import json
 import os
+import uuid
+import atexit
+import tempfile
+import threading
+import time
 from datetime import datetime
 
+from utils.sqlite_store import SQLiteStore, COLUMNS, projected_columns
+from utils.partitioned_store import PartitionedStore
+from utils.aggregates import ExpenseAggregates, group_keys
+from utils.money import to_cents, cents_of, cents_series, store_cents, add_display_amounts
+from utils.duplicates import DuplicateIndex, FINGERPRINT_COLUMNS, find_duplicate_groups
+from utils.compact_frame import to_compact_frame, memory_report
+from utils.exporters import stream_csv, stream_json, gzip_stream
+from utils.file_lock import FileLock
+from utils.file_modes import match_file_mode
+from utils.merchants import MerchantDictionary
+from utils.search_index import SearchIndex, SEARCH_COLUMNS
+from utils.range_index import DateRangeIndex, RANGE_COLUMNS
+from utils.recurring import find_recurring_expenses, RECURRING_COLUMNS
+from utils.anomalies import AnomalyDetector, ANOMALY_COLUMNS, THRESHOLD, score_history
+
+# load_expenses hands out shallow copies of its cached frames; copy-on-write
+# (always on from pandas 3) keeps in-place edits of them out of the cache
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
 class DataManager:
-    def __init__(self, data_file="expenses.json"):
+    def __init__(self, data_file="expenses.json", journal=False, compact_threshold=1000,
+                 backend="json", db_file="expenses.db", flush_interval=None,
+                 partition_dir="expenses_partitions", compaction_interval=None,
+                 compact_replay_seconds=None, duplicate_policy="flag", duplicate_window_days=14,
+                 normalize_merchants=False, anomaly_threshold=THRESHOLD):
         self.data_file = data_file
-        self.ensure_data_file()
+        self.backend = backend
+        # Journal mode keeps data_file as a snapshot and appends new records
+        # to a JSON Lines file next to it, so an insert writes one line.
+        self.journal = journal
+        self.journal_file = os.path.splitext(data_file)[0] + ".jsonl"
+        # Journal segment being folded into the snapshot by compact()
+        self.compacting_file = os.path.splitext(data_file)[0] + ".compacting.jsonl"
+        # Compact once the journal holds compact_threshold entries or a cold
+        # replay took compact_replay_seconds. Compaction always runs on a
+        # background thread, woken by the writer that crosses a threshold
+        # and, with compaction_interval (seconds) set, also periodically
+        self.compact_threshold = compact_threshold
+        self.compact_replay_seconds = compact_replay_seconds
+        self.compaction_interval = compaction_interval
+        self._journal_count = None
+        self._last_replay_seconds = 0.0
+        # (storage identity, frame) of the last load_expenses call
+        self._cache = None
+        # (storage identity, frame) of the last load_expenses(compact=True) call
+        self._compact_cache = None
+        # (storage identity, {(compact, columns): frame}) of column-projected loads
+        self._column_cache = None
+        # (storage identity, DateRangeIndex) answering date-range totals
+        self._range_index = None
+        # (storage identity, {scan key: result}) of whole-ledger scans
+        # (duplicates, recurring charges, anomalies) shown on every rerun
+        self._scans = None
+        # (storage identity, {id: record}) for the JSON backends
+        self._index = None
+        # (storage identity, ExpenseAggregates) kept current by our own writes
+        self._aggregates = None
+        # Inserts matching a stored expense (same merchant, amount and items on
+        # the same date, or an itemized receipt re-saved with a date up to
+        # duplicate_window_days off; see DuplicateIndex) are reported under
+        # "flag", skipped under "reject" and not checked when duplicate_policy is None
+        self.duplicate_policy = duplicate_policy
+        self.duplicate_window_days = duplicate_window_days
+        # (storage identity, DuplicateIndex) kept current like the aggregates
+        self._duplicates = None
+        # (storage identity, SearchIndex) over merchant, items and description
+        self._search_index = None
+        # Inserts further than anomaly_threshold spreads from their category's
+        # history are reported; None turns the check off
+        self.anomaly_threshold = anomaly_threshold
+        # (storage identity, AnomalyDetector) fed by every insert
+        self._anomalies = None
+        # With normalize_merchants, raw merchant names are mapped to canonical
+        # spellings on insert; off by default since it rewrites what was typed
+        self.merchants = None
+        if normalize_merchants:
+            self.merchants = MerchantDictionary(os.path.splitext(data_file)[0] + ".merchants.json")
+        # Write-behind: with flush_interval (seconds) set, JSON snapshot
+        # rewrites are coalesced into one flush per window
+        self.flush_interval = flush_interval
+        self._dirty = False
+        self._pending = []
+        self._flush_timer = None
+        if flush_interval:
+            atexit.register(self.flush)
+        # Writers in every process serialize on this lock; readers never take
+        # it because snapshots are replaced atomically
+        if backend == "sqlite":
+            lock_file = db_file + ".lock"
+        elif backend == "partitioned":
+            os.makedirs(partition_dir, exist_ok=True)
+            lock_file = os.path.join(partition_dir, ".lock")
+        else:
+            lock_file = data_file + ".lock"
+        self._lock = FileLock(lock_file)
+        self._compaction_lock = FileLock(data_file + ".compact.lock")
+        self._compaction_wakeup = threading.Event()
+        self._closed = False
+        self.store = None
+        if backend in ("sqlite", "partitioned"):
+            if backend == "sqlite":
+                is_new_store = not os.path.exists(db_file)
+            else:
+                is_new_store = not os.path.exists(os.path.join(partition_dir, "manifest.json"))
+            if backend == "sqlite":
+                self.store = SQLiteStore(db_file)
+            else:
+                self.store = PartitionedStore(partition_dir)
+            if is_new_store and os.path.exists(data_file):
+                # First run against a new store: import the JSON ledger
+                self.store.insert(self._read_snapshot())
+        else:
+            self.ensure_data_file()
+        self.backfill_ids()
+        self.migrate_amounts_to_cents()
+        if journal:
+            threading.Thread(
+                target=self._compaction_loop, name="expense-compaction", daemon=True
+            ).start()
     
     def ensure_data_file(self):
         """Ensure the data file exists"""
         if not os.path.exists(self.data_file):
-            with open(self.data_file, 'w') as f:
-                json.dump([], f)
+            self._write_snapshot([])
+    
+    def _read_snapshot(self):
+        """Read the list of records stored in the JSON data file"""
+        with open(self.data_file, 'r') as f:
+            return json.load(f)
+    
+    def _read_journal_file(self, path):
+        """Read entries of one journal file, skipping a torn trailing line"""
+        if not os.path.exists(path):
+            return []
+        
+        entries = []
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A crash mid-append can leave a partial last line
+                    print(f"Skipping corrupt journal line in {path}")
+        return entries
+    
+    def _read_journal(self):
+        """Read journal entries not yet folded into the snapshot, oldest first
+        
+        A segment left by an interrupted or running compaction is replayed
+        before the live journal. Replaying entries that are already in the
+        snapshot is harmless: every entry is keyed by id.
+        """
+        return self._read_journal_file(self.compacting_file) + self._read_journal_file(self.journal_file)
+    
+    def _replay(self, data, entries):
+        """Apply journal entries on top of snapshot records, keyed by id"""
+        records = {}
+        for record in data:
+            records[self._ensure_id(record)] = record
+        for entry in entries:
+            op = entry.get('op')
+            if op == 'add':
+                record = entry['data']
+                records[self._ensure_id(record)] = record
+            elif op == 'update' and entry.get('id') in records:
+                records[entry['id']].update(entry['data'])
+            elif op == 'delete':
+                records.pop(entry.get('id'), None)
+        return records
+    
+    def _read_records(self):
+        """Read all records as {id: record}, replaying the journal when enabled"""
+        data = self._read_snapshot()
+        entries = self._read_journal() if self.journal else []
+        return self._replay(data, entries)
+    
+    @staticmethod
+    def _new_id():
+        """Generate a stable unique expense id"""
+        return uuid.uuid4().hex
+    
+    @staticmethod
+    def _normalize_date(value):
+        """YYYY-MM-DD text of a date value; raises ValueError when it is not a date"""
+        date = pd.to_datetime(value, errors='coerce', format='mixed')
+        if pd.isna(date):
+            raise ValueError(f"invalid date: {value!r}")
+        return date.strftime('%Y-%m-%d')
+    
+    @staticmethod
+    def _missing_id(record):
+        """Whether a record lacks an id; frame rows without one hold NaN"""
+        expense_id = record.get('id')
+        return expense_id is None or expense_id == '' or (not isinstance(expense_id, str) and pd.isna(expense_id))
+    
+    def _ensure_id(self, record):
+        """Give a record an id if it does not have one yet"""
+        if self._missing_id(record):
+            record['id'] = self._new_id()
+        return record['id']
+    
+    def backfill_ids(self):
+        """Assign ids to stored records that predate stable ids (runs once)"""
+        with self._lock:
+            try:
+                if self.store is not None:
+                    return self.store.backfill_ids()
+                
+                data = self._read_snapshot()
+                entries = self._read_journal() if self.journal else []
+                missing = sum(1 for record in data if self._missing_id(record))
+                missing += sum(1 for entry in entries
+                               if entry.get('op') == 'add' and self._missing_id(entry['data']))
+                if missing:
+                    self._write_snapshot(list(self._replay(data, entries).values()))
+                    self._truncate_journal()
+                    self._index = None
+                    self._invalidate_cache()
+                return missing
+            except Exception as e:
+                print(f"Error backfilling expense ids: {e}")
+                return 0
+    
+    def migrate_amounts_to_cents(self):
+        """Convert stored float amounts to integer amount_cents (runs once)
+        
+        Returns the number of records converted.
+        """
+        with self._lock:
+            try:
+                if self.store is not None:
+                    return self.store.migrate_amounts()
+                
+                data = self._read_snapshot()
+                entries = self._read_journal() if self.journal else []
+                legacy = sum(1 for record in data if 'amount' in record)
+                legacy += sum(1 for entry in entries if 'amount' in entry.get('data', {}))
+                if legacy:
+                    records = self._replay(data, entries)
+                    for record in records.values():
+                        store_cents(record)
+                    self._write_snapshot(list(records.values()))
+                    self._truncate_journal()
+                    self._index = None
+                    self._invalidate_cache()
+                return legacy
+            except Exception as e:
+                print(f"Error migrating amounts to cents: {e}")
+                return 0
+    
+    def _append_journal(self, entries):
+        """Append entries to the journal as JSON Lines"""
+        lines = "".join(json.dumps(entry, default=str) + "\n" for entry in entries)
+        with open(self.journal_file, 'a') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        if self._journal_count is not None:
+            self._journal_count += len(entries)
+    
+    def _truncate_journal(self):
+        """Drop the journal once its entries are folded into the snapshot"""
+        for path in (self.compacting_file, self.journal_file):
+            if os.path.exists(path):
+                os.remove(path)
+        self._journal_count = 0
+    
+    def journal_length(self):
+        """Number of entries waiting in the journal"""
+        if not self.journal:
+            return 0
+        if self._journal_count is None:
+            self._journal_count = len(self._read_journal())
+        return self._journal_count
+    
+    def _needs_compaction(self):
+        """Whether the journal crossed its length or replay-time threshold"""
+        if self.journal_length() >= self.compact_threshold:
+            return True
+        return bool(self.compact_replay_seconds) and self._last_replay_seconds >= self.compact_replay_seconds
+    
+    def _compaction_loop(self):
+        """Background thread: compact whenever a threshold is crossed
+        
+        Sleeps until a writer wakes it, or at most compaction_interval
+        seconds when that is set.
+        """
+        while not self._closed:
+            self._compaction_wakeup.wait(self.compaction_interval)
+            self._compaction_wakeup.clear()
+            if self._closed:
+                break
+            try:
+                if self._needs_compaction():
+                    self.compact()
+            except Exception as e:
+                print(f"Error in background compaction: {e}")
+    
+    def compact(self):
+        """Fold the journal into the snapshot file
+        
+        The writer lock is only held to rotate the journal aside and, at the
+        end, to rename the new snapshot into place. Replaying and writing the
+        snapshot happen in between, while add_expense keeps appending to a
+        fresh journal.
+        """
+        if not self.journal:
+            return True
+        with self._compaction_lock:
+            try:
+                with self._lock:
+                    if not os.path.exists(self.compacting_file):
+                        if not os.path.exists(self.journal_file):
+                            return True
+                        os.replace(self.journal_file, self.compacting_file)
+                    snapshot_stat = os.stat(self.data_file)
+                
+                records = self._replay(self._read_snapshot(), self._read_journal_file(self.compacting_file))
+                tmp_path = self._write_temp_snapshot(list(records.values()))
+                
+                with self._lock:
+                    current_stat = os.stat(self.data_file)
+                    if (current_stat.st_mtime_ns, current_stat.st_ino) != (snapshot_stat.st_mtime_ns, snapshot_stat.st_ino):
+                        # A full save replaced the snapshot meanwhile; it already
+                        # contains everything we folded
+                        os.remove(tmp_path)
+                        return False
+                    
+                    index_current = self._index is not None and self._index[0] == self._storage_identity()
+                    aggregates_current = self._live_aggregates() is not None
+                    duplicates_current = self._live_duplicates() is not None
+                    anomalies_current = self._live_anomalies() is not None
+                    search_index_current = self._live_search_index() is not None
+                    self._install_snapshot(tmp_path)
+                    os.remove(self.compacting_file)
+                    self._journal_count = None
+                    # Content is unchanged, so in-memory state that was current stays current
+                    if not index_current:
+                        self._index = None
+                    if not aggregates_current:
+                        self._aggregates = None
+                    if not duplicates_current:
+                        self._duplicates = None
+                    if not anomalies_current:
+                        self._anomalies = None
+                    if not search_index_current:
+                        self._search_index = None
+                    self._mark_written()
+                return True
+            except Exception as e:
+                print(f"Error compacting journal: {e}")
+                return False
+    
+    def _storage_paths(self):
+        """Files whose changes invalidate the cached frame"""
+        if self.store is not None:
+            return self.store.storage_paths()
+        return [self.data_file, self.compacting_file, self.journal_file]
+    
+    def _storage_identity(self):
+        """(mtime, size, inode) of every storage file, None when missing"""
+        identity = []
+        for path in self._storage_paths():
+            try:
+                st = os.stat(path)
+                identity.append((st.st_mtime_ns, st.st_size, st.st_ino))
+            except FileNotFoundError:
+                identity.append(None)
+        return tuple(identity)
+    
+    def _invalidate_cache(self):
+        """Forget the cached frames after one of our own writes"""
+        self._cache = None
+        self._compact_cache = None
+        self._column_cache = None
+        self._range_index = None
+        self._scans = None
+    
+    def _get_index(self):
+        """Return the in-memory {id: record} index, reloading it if storage changed"""
+        index = self._index
+        if self._dirty and index is not None:
+            # Pending write-behind changes are newer than the file
+            return index[1]
+        
+        identity = self._storage_identity()
+        if index is not None and index[0] == identity:
+            return index[1]
+        
+        started = time.perf_counter()
+        records = self._read_records()
+        self._last_replay_seconds = time.perf_counter() - started
+        self._index = (identity, records)
+        # Another process may have appended to the journal
+        self._journal_count = None
+        return records
+    
+    def _mark_written(self):
+        """Re-stamp the index and aggregates after our own write so they are not reloaded"""
+        identity = self._storage_identity()
+        if self._index is not None:
+            self._index = (identity, self._index[1])
+        if self._aggregates is not None:
+            self._aggregates = (identity, self._aggregates[1])
+        if self._duplicates is not None:
+            self._duplicates = (identity, self._duplicates[1])
+        if self._anomalies is not None:
+            self._anomalies = (identity, self._anomalies[1])
+        if self._search_index is not None:
+            self._search_index = (identity, self._search_index[1])
+        self._invalidate_cache()
+    
+    def _live_aggregates(self):
+        """Aggregates still matching storage, or None (dropping stale ones)"""
+        aggregates = self._aggregates
+        if aggregates is None:
+            return None
+        if self._dirty or aggregates[0] == self._storage_identity():
+            return aggregates[1]
+        self._aggregates = None
+        return None
+    
+    def _get_aggregates(self):
+        """Return current aggregates, rebuilding them from storage on a cold start"""
+        aggregates = self._live_aggregates()
+        if aggregates is not None:
+            return aggregates
+        
+        identity = self._storage_identity()
+        if self.store is not None:
+            aggregates = ExpenseAggregates.from_group_stats(self.store.group_stats())
+        else:
+            aggregates = ExpenseAggregates.from_records(self._get_index().values())
+        self._aggregates = (identity, aggregates)
+        return aggregates
+    
+    def _live_duplicates(self):
+        """Duplicate index still matching storage, or None (dropping a stale one)"""
+        duplicates = self._duplicates
+        if duplicates is None:
+            return None
+        if self._dirty or duplicates[0] == self._storage_identity():
+            return duplicates[1]
+        self._duplicates = None
+        return None
+    
+    def _get_duplicates(self):
+        """Return the current duplicate index, rebuilding it from storage on a cold start"""
+        duplicates = self._live_duplicates()
+        if duplicates is not None:
+            return duplicates
+        
+        identity = self._storage_identity()
+        if self.store is not None:
+            records = self.store.select(columns=FINGERPRINT_COLUMNS).to_dict('records')
+        else:
+            records = self._get_index().values()
+        duplicates = DuplicateIndex.from_records(records, self.duplicate_window_days)
+        self._duplicates = (identity, duplicates)
+        return duplicates
+    
+    def _live_anomalies(self):
+        """Anomaly detector still matching storage, or None (dropping a stale one)"""
+        anomalies = self._anomalies
+        if anomalies is None:
+            return None
+        if self._dirty or anomalies[0] == self._storage_identity():
+            return anomalies[1]
+        self._anomalies = None
+        return None
+    
+    def _get_anomalies(self):
+        """Return the current anomaly detector, backfilling it from storage on a cold start"""
+        anomalies = self._live_anomalies()
+        if anomalies is not None:
+            return anomalies
+        
+        identity = self._storage_identity()
+        anomalies = AnomalyDetector.from_frame(self.load_expenses(columns=ANOMALY_COLUMNS), self.anomaly_threshold)
+        self._anomalies = (identity, anomalies)
+        return anomalies
+    
+    def _live_search_index(self):
+        """Search index still matching storage, or None (dropping a stale one)"""
+        search_index = self._search_index
+        if search_index is None:
+            return None
+        if self._dirty or search_index[0] == self._storage_identity():
+            return search_index[1]
+        self._search_index = None
+        return None
     
-    def load_expenses(self):
-        """Load expenses from JSON file"""
+    def _get_search_index(self):
+        """Return the current search index, rebuilding it from storage on a cold start"""
+        search_index = self._live_search_index()
+        if search_index is not None:
+            return search_index
+        
+        identity = self._storage_identity()
+        if self.store is not None:
+            records = self.store.select(columns=SEARCH_COLUMNS).to_dict('records')
+        else:
+            records = self._get_index().values()
+        search_index = SearchIndex.from_records(records)
+        self._search_index = (identity, search_index)
+        return search_index
+    
+    def _get_range_index(self):
+        """Return the date range index, rebuilding it when storage changed"""
+        identity = self._storage_identity()
+        range_index = self._range_index
+        if range_index is not None and range_index[0] == identity:
+            return range_index[1]
+        
+        range_index = DateRangeIndex.from_frame(self.load_expenses(columns=RANGE_COLUMNS))
+        self._range_index = (identity, range_index)
+        return range_index
+    
+    def _cached_scan(self, key, scan):
+        """Result of a whole-ledger scan, recomputed only when storage changed
+        
+        Results are shared with the cache; treat them as read-only.
+        """
+        identity = self._storage_identity()
+        scans = self._scans
+        if scans is None or scans[0] != identity:
+            scans = self._scans = (identity, {})
+        if key not in scans[1]:
+            scans[1][key] = scan()
+        return scans[1][key]
+    
+    def _group_extremes(self, grouping, key):
+        """Fresh (min, max) amount in cents of one aggregate group"""
+        if self.store is not None:
+            return self.store.group_extremes(grouping, key)
+        
+        amounts = [
+            amount for amount, keys in (
+                (cents_of(r), group_keys(r)) for r in self._get_index().values()
+            )
+            if amount is not None and keys[grouping] == key
+        ]
+        return (min(amounts), max(amounts)) if amounts else (None, None)
+    
+    def _write_temp_snapshot(self, data):
+        """Write records to an fsynced temp file next to data_file; returns its path"""
+        directory = os.path.dirname(os.path.abspath(self.data_file))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".expenses-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2, default=str)
+                f.flush()
+                os.fsync(f.fileno())
+            match_file_mode(tmp_path, self.data_file)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path
+    
+    def _install_snapshot(self, tmp_path):
+        """Atomically rename a temp snapshot over data_file"""
+        try:
+            os.replace(tmp_path, self.data_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        if os.name == 'posix':
+            # Persist the rename itself
+            directory = os.path.dirname(os.path.abspath(self.data_file))
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+    
+    def _write_snapshot(self, data):
+        """Atomically replace the JSON snapshot with a list of records
+        
+        The data goes to a temp file in the same directory, is fsynced and
+        then renamed over data_file, so readers and crashes only ever see
+        the old or the new file, never a truncated one.
+        """
+        self._install_snapshot(self._write_temp_snapshot(data))
+    
+    def _schedule_flush(self, entries):
+        """Queue mutations for write-behind and start the flush timer if idle"""
+        with self._lock:
+            self._pending.extend(entries)
+            self._dirty = True
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def _cancel_flush(self):
+        """Drop pending write-behind changes superseded by a full write"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._pending = []
+            self._dirty = False
+    
+    def flush(self):
+        """Write pending write-behind changes to disk now
+        
+        The queued mutations are replayed on top of the snapshot as it is on
+        disk, so rows written meanwhile by other processes are kept.
+        """
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending:
+                return True
+            try:
+                records = self._replay(self._read_snapshot(), self._pending)
+                self._write_snapshot(list(records.values()))
+                self._pending = []
+                self._dirty = False
+                self._index = (self._storage_identity(), records)
+                self._aggregates = None
+                self._duplicates = None
+                self._anomalies = None
+                self._search_index = None
+                self._invalidate_cache()
+                return True
+            except Exception as e:
+                print(f"Error flushing expenses: {e}")
+                return False
+    
+    def close(self):
+        """Flush pending writes and stop background work before dropping the manager"""
+        self._closed = True
+        self._compaction_wakeup.set()
+        if self.flush_interval:
+            self.flush()
+            atexit.unregister(self.flush)
+    
+    def _append_or_rewrite(self, entries):
+        """Persist mutations: one journal append, or one full snapshot rewrite"""
+        if self.journal:
+            self._append_journal(entries)
+            self._mark_written()
+            if self._needs_compaction():
+                # Let the background thread fold it; never block the writer
+                self._compaction_wakeup.set()
+        elif self.flush_interval:
+            self._schedule_flush(entries)
+            self._invalidate_cache()
+        else:
+            self._write_snapshot(list(self._index[1].values()))
+            self._mark_written()
+    
+    def load_expenses(self, compact=False, columns=None):
+        """Load expenses, reusing the cached frame while storage is unchanged
+        
+        The returned frame shares its data with the cache under
+        copy-on-write, so modifying it in place copies the touched columns
+        and never changes what later callers get.
+        
+        With compact=True the frame uses the typed schema of
+        utils.compact_frame (datetime dates, categorical category and
+        merchant, nullable Int64 amount_cents) instead of strings and float amounts.
+        
+        With columns, only those columns are read and cached, so views that
+        skip the long description and items texts never materialize them.
+        """
+        identity = self._storage_identity()
+        if columns is not None:
+            return self._load_columns(projected_columns(columns), compact, identity)
+        cache = self._compact_cache if compact else self._cache
+        if cache is not None and cache[0] == identity:
+            return cache[1].copy(deep=False)
+        
+        if compact:
+            expenses_df = to_compact_frame(self.load_expenses())
+            self._compact_cache = (identity, expenses_df)
+        else:
+            expenses_df = self._load_uncached()
+            self._cache = (identity, expenses_df)
+        return expenses_df.copy(deep=False)
+    
+    def _load_columns(self, columns, compact, identity):
+        """Load a column projection, from the full cached frame when it is current"""
+        cache = self._column_cache
+        if cache is None or cache[0] != identity:
+            cache = self._column_cache = (identity, {})
+        key = (compact, tuple(columns))
+        expenses_df = cache[1].get(key)
+        if expenses_df is None:
+            if compact:
+                expenses_df = to_compact_frame(self.load_expenses(columns=columns))
+            elif self._cache is not None and self._cache[0] == identity:
+                expenses_df = self._cache[1][columns]
+            else:
+                expenses_df = self._load_uncached(columns)
+            cache[1][key] = expenses_df
+        return expenses_df.copy(deep=False)
+    
+    def compact_memory_report(self):
+        """Measured memory of the ledger frame in standard vs compact schema"""
+        return memory_report(self.load_expenses(), self.load_expenses(compact=True))
+    
+    def _load_uncached(self, columns=None):
+        """Load expenses from JSON file, optionally only some columns"""
         try:
-            with open(self.data_file, 'r') as f:
-                data = json.load(f)
+            if self.store is not None:
+                return self.store.select(columns=columns)
+            
+            data = list(self._get_index().values())
             
             if not data:
-                return pd.DataFrame(columns=[
-                    'merchant', 'amount', 'date', 'items', 'category', 'description', 'timestamp'
-                ])
+                return pd.DataFrame(columns=columns or COLUMNS)
             
-            df = pd.DataFrame(data)
+            if columns is None:
+                df = pd.DataFrame(data)
+            else:
+                # Only the requested keys are pulled out of the records; date is
+                # needed to sort and amount is derived from amount_cents
+                keys = [*columns, 'date'] + (['amount_cents'] if 'amount' in columns else [])
+                df = pd.DataFrame(data, columns=list(dict.fromkeys(keys)))
             df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+            # The one conversion from stored cents to display amounts
+            add_display_amounts(df)
             
             # Handle missing columns for backward compatibility
-            if 'timestamp' not in df.columns:
+            if columns is None and 'timestamp' not in df.columns:
                 df['timestamp'] = datetime.now().isoformat()
             
-            return df.sort_values('date', ascending=False)
+            df = df.sort_values('date', ascending=False)
+            return df if columns is None else df[columns]
             
         except Exception as e:
             print(f"Error loading expenses: {e}")
-            return pd.DataFrame(columns=[
-                'merchant', 'amount', 'date', 'items', 'category',  'description','timestamp'
-            ])
+            return pd.DataFrame(columns=columns or COLUMNS)
     
     def save_expenses(self, expenses_df):
         """Save expenses DataFrame to JSON file"""
-        try:
-            data = expenses_df.to_dict('records')
-            with open(self.data_file, 'w') as f:
-                json.dump(data, f, indent=2, default=str)
-            return True
-        except Exception as e:
-            print(f"Error saving expenses: {e}")
-            return False
+        with self._lock:
+            try:
+                data = expenses_df.to_dict('records')
+                for record in data:
+                    self._ensure_id(record)
+                    store_cents(record)
+                self._aggregates = None
+                self._duplicates = None
+                self._anomalies = None
+                self._search_index = None
+                if self.store is not None:
+                    self.store.replace_all(data)
+                    self._invalidate_cache()
+                else:
+                    self._cancel_flush()
+                    self._write_snapshot(data)
+                    # A full save already contains every journaled record
+                    self._truncate_journal()
+                    self._index = (self._storage_identity(), {r['id']: r for r in data})
+                    self._invalidate_cache()
+                return True
+            except Exception as e:
+                print(f"Error saving expenses: {e}")
+                return False
     
-    def add_expense(self, expense_data):
-        """Add a new expense"""
-        try:
-            # Load existing data
-            expenses_df = self.load_expenses()
-            
-            # Add timestamp for uniqueness
-            expense_data['timestamp'] = datetime.now().isoformat()
-            
-            # Convert to DataFrame and append
-            new_expense_df = pd.DataFrame([expense_data])
+    def _canonicalize_merchants(self, records):
+        """Replace raw merchant names with their canonical spelling, saving new ones"""
+        if self.merchants is None:
+            return
+        # Pick up spellings other processes learned
+        self.merchants.refresh()
+        known = len(self.merchants.aliases)
+        for record in records:
+            record['merchant'] = self.merchants.resolve(record.get('merchant'))
+        if len(self.merchants.aliases) != known:
+            self.merchants.save()
+    
+    def _insert_records(self, records):
+        """Persist already stamped records in a single write or transaction
+        
+        Returns, in input order, the id of the stored expense each record
+        duplicates or None, and the anomaly score of each record (see
+        AnomalyDetector.score) when it is unusual for its category, else
+        None. Duplicates are not written under the "reject" policy.
+        """
+        with self._lock:
+            self._canonicalize_merchants(records)
+            aggregates = self._live_aggregates()
+            search_index = self._live_search_index()
+            duplicate_of = [None] * len(records)
+            kept = [True] * len(records)
+            if self.duplicate_policy:
+                duplicates = self._get_duplicates()
+                for i, record in enumerate(records):
+                    matches = duplicates.find(record)
+                    if matches:
+                        duplicate_of[i] = matches[0]
+                    if not matches or self.duplicate_policy != "reject":
+                        duplicates.add(record)
+                if self.duplicate_policy == "reject":
+                    kept = [original is None for original in duplicate_of]
+            anomalies = [None] * len(records)
+            if self.anomaly_threshold is not None:
+                detector = self._get_anomalies()
+                for i, record in enumerate(records):
+                    if kept[i]:
+                        score = detector.observe(record)
+                        if score is not None and score['anomalous']:
+                            anomalies[i] = score
+            records = [record for record, keep in zip(records, kept) if keep]
+            if not records:
+                return duplicate_of, anomalies
             
-            if expenses_df.empty:
-                updated_df = new_expense_df
+            if self.store is not None:
+                self.store.insert(records)
             else:
-                updated_df = pd.concat([expenses_df, new_expense_df], ignore_index=True)
+                index = self._get_index()
+                for record in records:
+                    index[record['id']] = record
+                self._append_or_rewrite([{'op': 'add', 'data': record} for record in records])
             
-            # Save updated data
-            return self.save_expenses(updated_df)
+            if aggregates is not None:
+                for record in records:
+                    aggregates.add(record)
+            if search_index is not None:
+                for record in records:
+                    search_index.add(record)
+            self._mark_written()
+            return duplicate_of, anomalies
+    
+    def _prepare_records(self, records):
+        """Validate records and build the stamped copies to store
+        
+        The one set of checks behind add_expense and add_expenses, so both
+        accept the same records. Returns (errors, prepared): per input
+        record, in order, the reason it was rejected or None, and its
+        stored form (amount as integer amount_cents, YYYY-MM-DD date, new
+        id and timestamp) or None. The caller's dicts are left as given.
+        """
+        # Parse all amounts and dates at once rather than per record
+        cents = cents_series(
+            pd.Series([r.get('amount') if isinstance(r, dict) else None for r in records], dtype=object)
+        )
+        dates = pd.to_datetime(
+            pd.Series([r.get('date') if isinstance(r, dict) else None for r in records], dtype=object),
+            errors='coerce', format='mixed'
+        )
+        
+        timestamp = datetime.now().isoformat()
+        errors = [None] * len(records)
+        prepared = [None] * len(records)
+        for i, record in enumerate(records):
+            if not isinstance(record, dict):
+                errors[i] = "record is not a dict"
+            elif not record.get('merchant'):
+                errors[i] = "missing merchant"
+            elif pd.isna(cents.iat[i]) or cents.iat[i] < 0:
+                errors[i] = f"invalid amount: {record.get('amount')!r}"
+            elif pd.isna(dates.iat[i]):
+                errors[i] = f"invalid date: {record.get('date')!r}"
+            else:
+                # Stored records hold cents only
+                record = {key: value for key, value in record.items() if key != 'amount'}
+                record['amount_cents'] = int(cents.iat[i])
+                # Aggregates and range queries key on YYYY-MM-DD text
+                record['date'] = dates.iat[i].strftime('%Y-%m-%d')
+                record['timestamp'] = timestamp
+                record['id'] = self._new_id()
+                prepared[i] = record
+        return errors, prepared
+    
+    def add_expense(self, expense_data):
+        """Add a new expense"""
+        errors, prepared = self._prepare_records([expense_data])
+        if errors[0] is not None:
+            print(f"Error adding expense: {errors[0]}")
+            return False
+        expense_data = prepared[0]
+        try:
+            duplicates, anomalies = self._insert_records([expense_data])
+            if duplicates[0] is not None and self.duplicate_policy == "reject":
+                print(f"Skipping duplicate of expense {duplicates[0]}")
+                return False
+            if anomalies[0] is not None:
+                print(f"Unusual amount for {expense_data.get('category', 'Other')}: "
+                      f"${expense_data['amount_cents'] / 100:.2f}, typically ${anomalies[0]['expected']:.2f}")
+            return True
             
         except Exception as e:
             print(f"Error adding expense: {e}")
+            self._index = None
+            self._aggregates = None
+            self._duplicates = None
+            self._anomalies = None
+            self._search_index = None
             return False
     
-    def delete_expense(self, index):
-        """Delete an expense by index"""
+    def add_expenses(self, records):
+        """Validate and add many expenses in one write
+        
+        Returns one result per input record, in order: {'id': new_id,
+        'error': None} for stored records and {'id': None, 'error': reason}
+        for rejected ones. 'duplicate_of' holds the id of the stored expense
+        a record duplicates, or None; 'anomaly' the score of a record whose
+        amount is unusual for its category, or None.
+        """
+        results = [{'id': None, 'error': None, 'duplicate_of': None, 'anomaly': None} for _ in records]
+        if not records:
+            return results
+        
+        errors, prepared = self._prepare_records(records)
+        valid = []
+        for result, error, record in zip(results, errors, prepared):
+            result['error'] = error
+            if record is not None:
+                result['id'] = record['id']
+                valid.append(record)
+        
         try:
-            expenses_df = self.load_expenses()
+            if valid:
+                duplicate_of, anomalies = self._insert_records(valid)
+                positions = [i for i, result in enumerate(results) if result['id'] is not None]
+                for i, original, anomaly in zip(positions, duplicate_of, anomalies):
+                    results[i]['anomaly'] = anomaly
+                    if original is None:
+                        continue
+                    results[i]['duplicate_of'] = original
+                    if self.duplicate_policy == "reject":
+                        results[i]['id'] = None
+                        results[i]['error'] = f"duplicate of {original}"
+        except Exception as e:
+            print(f"Error adding expenses: {e}")
+            self._index = None
+            self._aggregates = None
+            self._duplicates = None
+            self._anomalies = None
+            self._search_index = None
+            for result in results:
+                if result['id'] is not None:
+                    result['id'] = None
+                    result['error'] = f"write failed: {e}"
+        return results
+    
+    def query(self, start_date=None, end_date=None, categories=None, merchants=None, columns=None):
+        """Load only the expenses and columns matching the given predicates
+        
+        Dates are inclusive and may be date objects or strings; categories
+        and merchants are lists of accepted values. Filters run in SQL or
+        partition pruning when a store is active, and as vectorized masks on
+        the cached frame for the JSON backends. Rows come newest first.
+        """
+        try:
+            if self.store is not None:
+                return self.store.select(start_date, end_date, categories, merchants, columns)
             
-            if 0 <= index < len(expenses_df):
-                expenses_df = expenses_df.drop(expenses_df.index[index])
-                return self.save_expenses(expenses_df)
+            loaded = None
+            if columns is not None:
+                # Load the projection plus whatever the filters look at
+                loaded = list(dict.fromkeys([*projected_columns(columns), 'date', 'category', 'merchant']))
+            expenses_df = self.load_expenses(columns=loaded)
+            # Dates are normalized YYYY-MM-DD strings, so they compare correctly as text
+            mask = pd.Series(True, index=expenses_df.index)
+            if start_date is not None:
+                mask &= expenses_df['date'] >= pd.Timestamp(start_date).strftime('%Y-%m-%d')
+            if end_date is not None:
+                mask &= expenses_df['date'] <= pd.Timestamp(end_date).strftime('%Y-%m-%d')
+            if categories:
+                mask &= expenses_df['category'].isin(categories)
+            if merchants:
+                mask &= expenses_df['merchant'].isin(merchants)
+            if columns is not None:
+                return expenses_df.loc[mask, projected_columns(columns)]
+            return expenses_df[mask]
             
-            return False
         except Exception as e:
-            print(f"Error deleting expense: {e}")
-            return False
+            print(f"Error querying expenses: {e}")
+            return pd.DataFrame(columns=list(columns) if columns else COLUMNS)
     
-    def update_expense(self, index, updated_data):
-        """Update an existing expense"""
+    def get_expense(self, expense_id):
+        """Get a single expense record by id, or None"""
         try:
-            expenses_df = self.load_expenses()
-            
-            if 0 <= index < len(expenses_df):
-                for key, value in updated_data.items():
-                    expenses_df.iloc[index, expenses_df.columns.get_loc(key)] = value
+            if self.store is not None:
+                record = self.store.get(expense_id)
+            else:
+                record = self._get_index().get(expense_id)
+                record = dict(record) if record is not None else None
+            if record is not None and record.get('amount_cents') is not None:
+                record['amount'] = record['amount_cents'] / 100
+            return record
+        except Exception as e:
+            print(f"Error getting expense: {e}")
+            return None
+    
+    def delete_expense_by_id(self, expense_id):
+        """Delete an expense by its stable id"""
+        with self._lock:
+            try:
+                aggregates = self._live_aggregates()
+                duplicates = self._live_duplicates()
+                search_index = self._live_search_index()
+                if self.store is not None:
+                    tracked = aggregates is not None or duplicates is not None or search_index is not None
+                    record = self.store.get(expense_id) if tracked else None
+                    if not self.store.delete(expense_id):
+                        return False
+                else:
+                    record = self._get_index().pop(expense_id, None)
+                    if record is None:
+                        return False
+                    self._append_or_rewrite([{'op': 'delete', 'id': expense_id}])
                 
-                return self.save_expenses(expenses_df)
-            
-            return False
+                if aggregates is not None and record is not None:
+                    aggregates.remove(record)
+                if duplicates is not None and record is not None:
+                    duplicates.remove(record)
+                if search_index is not None and record is not None:
+                    search_index.remove(record)
+                # Running statistics cannot forget an expense; backfill on next use
+                self._anomalies = None
+                self._mark_written()
+                return True
+            except Exception as e:
+                print(f"Error deleting expense: {e}")
+                self._index = None
+                self._aggregates = None
+                self._duplicates = None
+                self._anomalies = None
+                self._search_index = None
+                return False
+    
+    def update_expense_by_id(self, expense_id, updated_data):
+        """Update fields of an expense by its stable id"""
+        with self._lock:
+            try:
+                changes = {k: v for k, v in updated_data.items() if k != 'id'}
+                if 'amount' in changes:
+                    changes['amount_cents'] = to_cents(changes.pop('amount'))
+                if 'date' in changes:
+                    changes['date'] = self._normalize_date(changes['date'])
+                aggregates = self._live_aggregates()
+                duplicates = self._live_duplicates()
+                search_index = self._live_search_index()
+                if self.store is not None:
+                    tracked = aggregates is not None or duplicates is not None or search_index is not None
+                    old_record = self.store.get(expense_id) if tracked else None
+                    if not self.store.update(expense_id, changes):
+                        return False
+                    new_record = dict(old_record, **changes) if old_record is not None else None
+                else:
+                    record = self._get_index().get(expense_id)
+                    if record is None:
+                        return False
+                    old_record = dict(record)
+                    record.update(changes)
+                    new_record = record
+                    self._append_or_rewrite([{'op': 'update', 'id': expense_id, 'data': changes}])
+                
+                if aggregates is not None and old_record is not None:
+                    aggregates.remove(old_record)
+                    aggregates.add(new_record)
+                if duplicates is not None and old_record is not None:
+                    duplicates.remove(old_record)
+                    duplicates.add(new_record)
+                if search_index is not None and old_record is not None:
+                    search_index.remove(old_record)
+                    search_index.add(new_record)
+                if 'amount_cents' in changes or 'category' in changes:
+                    self._anomalies = None
+                self._mark_written()
+                return True
+            except Exception as e:
+                print(f"Error updating expense: {e}")
+                self._index = None
+                self._aggregates = None
+                self._duplicates = None
+                self._anomalies = None
+                self._search_index = None
+                return False
+    
+    def search_expenses(self, text, columns=None, limit=None):
+        """Expenses whose merchant, items or description match every word of text
+        
+        Words match as prefixes, so "capp" finds "Cappuccino". Rows come
+        newest first, at most limit of them.
+        """
+        try:
+            ids = self._get_search_index().search(text)
+            columns = projected_columns(columns)
+            if not ids:
+                return pd.DataFrame(columns=columns)
+            if self.store is not None:
+                expenses_df = self.store.select_ids(ids, columns)
+            else:
+                index = self._get_index()
+                expenses_df = add_display_amounts(
+                    pd.DataFrame([index[expense_id] for expense_id in ids if expense_id in index])
+                )
+                for column in columns:
+                    if column not in expenses_df.columns:
+                        expenses_df[column] = None
+                expenses_df = expenses_df.sort_values('date', ascending=False, kind='stable')
+            if limit is not None:
+                expenses_df = expenses_df.head(limit)
+            return expenses_df[columns].reset_index(drop=True)
         except Exception as e:
-            print(f"Error updating expense: {e}")
-            return False
+            print(f"Error searching expenses: {e}")
+            return pd.DataFrame(columns=list(columns) if columns else COLUMNS)
+    
+    def find_duplicates(self, expense_data):
+        """Ids of stored expenses that duplicate an expense, closest date first"""
+        try:
+            if self.merchants is not None:
+                expense_data = dict(expense_data, merchant=self.merchants.resolve(expense_data.get('merchant'), learn=False))
+            return self._get_duplicates().find(expense_data)
+        except Exception as e:
+            print(f"Error finding duplicates: {e}")
+            return []
+    
+    def check_anomaly(self, expense_data):
+        """Score an unsaved expense against its category's history
+        
+        Returns None when the category has too little history, else a dict
+        with zscore, ewma_zscore, expected (typical amount) and anomalous.
+        """
+        try:
+            if self.anomaly_threshold is None:
+                return None
+            return self._get_anomalies().score(expense_data)
+        except Exception as e:
+            print(f"Error checking anomaly: {e}")
+            return None
+    
+    def find_anomalous_expenses(self):
+        """Backfill: score the whole history in date order and return the unusual expenses
+        
+        Each expense is compared with the earlier expenses of its category,
+        as if it had been checked when it was saved; vectorized over the
+        ledger and cached until storage changes.
+        """
+        try:
+            return self._cached_scan('anomalies', self._scan_anomalies).copy(deep=False)
+        except Exception as e:
+            print(f"Error finding anomalous expenses: {e}")
+            return pd.DataFrame(columns=ANOMALY_COLUMNS)
+    
+    def _scan_anomalies(self):
+        """Uncached find_anomalous_expenses"""
+        expenses_df = self.load_expenses(columns=ANOMALY_COLUMNS)
+        if expenses_df.empty or self.anomaly_threshold is None:
+            return expenses_df.iloc[:0]
+        scores = score_history(expenses_df, self.anomaly_threshold)
+        flagged = scores['anomalous'].to_numpy()
+        result = expenses_df[flagged].copy()
+        result['amount'] = result['amount_cents'].astype('float64') / 100
+        result['expected'] = scores['expected'].to_numpy()[flagged]
+        result['zscore'] = scores['zscore'].to_numpy()[flagged]
+        return result.sort_values('date', ascending=False)
+    
+    def find_duplicate_expenses(self):
+        """Group the stored history into clusters of duplicate expense ids
+        
+        Each list is ordered oldest first; runs as one sort over the ledger,
+        and only again once storage changed.
+        """
+        try:
+            return self._cached_scan('duplicates', lambda: find_duplicate_groups(
+                self.query(columns=FINGERPRINT_COLUMNS), self.duplicate_window_days
+            ))
+        except Exception as e:
+            print(f"Error finding duplicate expenses: {e}")
+            return []
+    
+    def find_recurring_expenses(self, min_occurrences=3):
+        """Detect weekly, monthly and annual charges in the stored history
+        
+        See utils.recurring.find_recurring_expenses; largest monthly cost
+        first. Cached until storage changes.
+        """
+        try:
+            return self._cached_scan(('recurring', min_occurrences), lambda: find_recurring_expenses(
+                self.load_expenses(columns=RECURRING_COLUMNS), min_occurrences
+            ))
+        except Exception as e:
+            print(f"Error finding recurring expenses: {e}")
+            return []
+    
+    def remove_duplicate_expenses(self):
+        """Delete every duplicate in the history, keeping the oldest of each cluster
+        
+        Returns the number of expenses removed.
+        """
+        with self._lock:
+            try:
+                extra_ids = [expense_id for group in self.find_duplicate_expenses() for expense_id in group[1:]]
+                if not extra_ids:
+                    return 0
+                if self.store is not None:
+                    for expense_id in extra_ids:
+                        self.store.delete(expense_id)
+                else:
+                    index = self._get_index()
+                    for expense_id in extra_ids:
+                        index.pop(expense_id, None)
+                    self._append_or_rewrite([{'op': 'delete', 'id': expense_id} for expense_id in extra_ids])
+                self._aggregates = None
+                self._duplicates = None
+                self._anomalies = None
+                self._search_index = None
+                self._mark_written()
+                return len(extra_ids)
+            except Exception as e:
+                print(f"Error removing duplicate expenses: {e}")
+                self._index = None
+                self._aggregates = None
+                self._duplicates = None
+                self._anomalies = None
+                self._search_index = None
+                return 0
+    
+    def normalize_merchant_history(self):
+        """Rewrite stored merchant names to their canonical spelling
+        
+        Each distinct name is resolved once; changed records are written in
+        one batch. Returns the number of expenses updated.
+        """
+        if self.merchants is None:
+            return 0
+        with self._lock:
+            try:
+                expenses_df = self.query(columns=['id', 'merchant'])
+                names = expenses_df['merchant'].dropna().unique()
+                self.merchants.refresh()
+                known = len(self.merchants.aliases)
+                canonical = {name: self.merchants.resolve(name) for name in names}
+                if len(self.merchants.aliases) != known:
+                    self.merchants.save()
+                
+                resolved = expenses_df['merchant'].map(canonical).fillna(expenses_df['merchant'])
+                changed_mask = resolved != expenses_df['merchant']
+                if not changed_mask.any():
+                    return 0
+                changed = expenses_df.loc[changed_mask].assign(merchant=resolved[changed_mask])
+                if self.store is not None:
+                    for expense_id, merchant in zip(changed['id'], changed['merchant']):
+                        self.store.update(expense_id, {'merchant': merchant})
+                else:
+                    index = self._get_index()
+                    entries = []
+                    for expense_id, merchant in zip(changed['id'], changed['merchant']):
+                        index[expense_id]['merchant'] = merchant
+                        entries.append({'op': 'update', 'id': expense_id, 'data': {'merchant': merchant}})
+                    self._append_or_rewrite(entries)
+                self._duplicates = None
+                self._search_index = None
+                self._mark_written()
+                return len(changed)
+            except Exception as e:
+                print(f"Error normalizing merchants: {e}")
+                self._index = None
+                self._duplicates = None
+                self._anomalies = None
+                self._search_index = None
+                return 0
+    
+    def _id_at(self, index):
+        """Id of the expense at a position of the date-sorted frame"""
+        expenses_df = self.load_expenses()
+        if 0 <= index < len(expenses_df):
+            return expenses_df['id'].iloc[index]
+        return None
+    
+    def delete_expense(self, index):
+        """Delete an expense by index"""
+        expense_id = self._id_at(index)
+        return expense_id is not None and self.delete_expense_by_id(expense_id)
+    
+    def update_expense(self, index, updated_data):
+        """Update an existing expense"""
+        expense_id = self._id_at(index)
+        return expense_id is not None and self.update_expense_by_id(expense_id, updated_data)
     
     def get_category_summary(self):
-        """Get spending summary by category"""
+        """Get spending summary by category
+        
+        Returns {'sum': {category: value}, 'count': ..., 'mean': ..., 'min': ...,
+        'max': ...} from the incrementally maintained aggregates.
+        """
         try:
-            expenses_df = self.load_expenses()
-            
-            if expenses_df.empty:
+            summary = self._get_aggregates().summary('category', self._group_extremes)
+            if not summary:
                 return {}
             
-            summary = expenses_df.groupby('category')['amount'].agg(['sum', 'count', 'mean']).to_dict()
-            return summary
+            return {
+                stat: {category: stats[stat] for category, stats in summary.items()}
+                for stat in ('sum', 'count', 'mean', 'min', 'max')
+            }
             
         except Exception as e:
             print(f"Error getting category summary: {e}")
@@ -123,30 +1317,81 @@ class DataManager:
     def get_monthly_summary(self):
         """Get spending summary by month"""
         try:
-            expenses_df = self.load_expenses()
+            summary = self._get_aggregates().summary('month', self._group_extremes)
+            return {month: summary[month]['sum'] for month in sorted(summary)}
             
-            if expenses_df.empty:
-                return {}
-            
-            expenses_df['month'] = pd.to_datetime(expenses_df['date']).dt.to_period('M')
-            summary = expenses_df.groupby('month')['amount'].sum().to_dict()
+        except Exception as e:
+            print(f"Error getting monthly summary: {e}")
+            return {}
+    
+    def get_month_category_summary(self):
+        """Get sum, count, mean, min and max per month and category
+        
+        Returns {month: {category: stats}} with months in ascending order.
+        """
+        try:
+            summary = self._get_aggregates().summary('month_category', self._group_extremes)
+            result = {}
+            for (month, category) in sorted(summary):
+                result.setdefault(month, {})[category] = summary[(month, category)]
+            return result
             
-            # Convert periods to strings for JSON serialization
-            return {str(k): v for k, v in summary.items()}
+        except Exception as e:
+            print(f"Error getting month/category summary: {e}")
+            return {}
+    
+    def get_range_summary(self, start_date=None, end_date=None):
+        """Get spending between two inclusive dates from the prefix-sum index
+        
+        Returns {'sum', 'count', 'days', 'daily_mean', 'max', 'top_category',
+        'categories': {category: {'sum', 'count', 'mean'}}}, where days counts
+        the days with at least one expense. Changing the range costs two
+        binary searches rather than a pass over the ledger.
+        """
+        try:
+            summary = self._get_range_index().summary(start_date, end_date)
+            categories = {
+                category: {
+                    'sum': stats['sum'] / 100,
+                    'count': stats['count'],
+                    'mean': stats['sum'] / stats['count'] / 100
+                }
+                for category, stats in summary['categories'].items()
+            }
+            return {
+                'sum': summary['sum'] / 100,
+                'count': summary['count'],
+                'days': summary['days'],
+                'daily_mean': summary['sum'] / summary['days'] / 100 if summary['days'] else 0.0,
+                'max': summary['max'] / 100 if summary['max'] is not None else None,
+                'top_category': max(summary['categories'], key=lambda c: summary['categories'][c]['sum'], default=None),
+                'categories': categories
+            }
             
         except Exception as e:
-            print(f"Error getting monthly summary: {e}")
+            print(f"Error getting range summary: {e}")
             return {}
     
     def clear_all_data(self):
         """Clear all expense data"""
-        try:
-            with open(self.data_file, 'w') as f:
-                json.dump([], f)
-            return True
-        except Exception as e:
-            print(f"Error clearing data: {e}")
-            return False
+        with self._lock:
+            try:
+                if self.store is not None:
+                    self.store.clear()
+                else:
+                    self._cancel_flush()
+                    self._write_snapshot([])
+                    self._truncate_journal()
+                    self._index = None
+                self._aggregates = None
+                self._duplicates = None
+                self._anomalies = None
+                self._search_index = None
+                self._invalidate_cache()
+                return True
+            except Exception as e:
+                print(f"Error clearing data: {e}")
+                return False
     
     def export_to_csv(self):
         """Export expenses to CSV string"""
@@ -165,3 +1410,47 @@ class DataManager:
         except Exception as e:
             print(f"Error exporting to JSON: {e}")
             return ""
+    
+    def iter_expense_batches(self, batch_size=5000, columns=None):
+        """Yield the ledger as DataFrames of at most batch_size rows, newest first
+        
+        SQLite and partitioned storage stream rows straight from disk; the
+        JSON backends slice the already parsed ledger.
+        """
+        if self.store is not None:
+            yield from self.store.iter_batches(batch_size, columns)
+            return
+        
+        expenses_df = self.load_expenses()
+        if columns is not None:
+            expenses_df = expenses_df[projected_columns(columns)]
+        for start in range(0, len(expenses_df), batch_size):
+            yield expenses_df.iloc[start:start + batch_size]
+    
+    def stream_export(self, fmt="csv", batch_size=5000, columns=None, compress=False):
+        """Yield an export of the ledger chunk by chunk
+        
+        fmt is "csv" or "json". Chunks are str, or gzip bytes with compress=True.
+        """
+        if columns is not None and not list(columns):
+            raise ValueError("No columns selected for export")
+        batches = self.iter_expense_batches(batch_size, columns)
+        if fmt == "csv":
+            chunks = stream_csv(batches)
+        elif fmt == "json":
+            chunks = stream_json(batches)
+        else:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        return gzip_stream(chunks) if compress else chunks
+    
+    def write_export(self, path, fmt="csv", batch_size=5000, columns=None, compress=False):
+        """Stream an export to a file; returns True on success"""
+        try:
+            mode = 'wb' if compress else 'w'
+            with open(path, mode) as f:
+                for chunk in self.stream_export(fmt, batch_size, columns, compress):
+                    f.write(chunk)
+            return True
+        except Exception as e:
+            print(f"Error writing export: {e}")
+            return False
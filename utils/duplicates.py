@@ -0,0 +1,177 @@
+import hashlib
+import re
+from datetime import date as date_type
+import pandas as pd
+
+from utils.money import cents_of, cents_series
+
+# Columns needed to fingerprint a stored expense
+FINGERPRINT_COLUMNS = ['id', 'merchant', 'amount_cents', 'date', 'items']
+
+
+def normalize_merchant(merchant):
+    """Lowercase merchant name without punctuation or repeated whitespace"""
+    text = re.sub(r'[^\w\s]', ' ', str(merchant or '').lower())
+    return ' '.join(text.split())
+
+
+def normalize_merchant_series(merchants):
+    """Vectorized normalize_merchant over a Series, normalizing each distinct name once"""
+    codes, names = pd.factorize(merchants.astype(object), use_na_sentinel=False)
+    normalized = (pd.Series(names, dtype=object).fillna('').astype(str).str.lower()
+                  .str.replace(r'[^\w\s]', ' ', regex=True).str.split().str.join(' '))
+    return pd.Series(normalized.to_numpy(dtype=object)[codes], index=merchants.index)
+
+
+def items_hash(items):
+    """Short order-insensitive hash of a receipt's items (list or comma-separated text)"""
+    if isinstance(items, (list, tuple)):
+        parts = items
+    else:
+        parts = str(items or '').split(',')
+    normalized = sorted(p for p in (' '.join(str(part).lower().split()) for part in parts) if p)
+    return hashlib.sha1('|'.join(normalized).encode('utf-8')).hexdigest()[:16]
+
+
+def fingerprint(record):
+    """(merchant, amount in cents, items hash) of a record, or None without a numeric amount"""
+    cents = cents_of(record)
+    if cents is None:
+        return None
+    return (normalize_merchant(record.get('merchant')), cents, items_hash(record.get('items')))
+
+
+def day_of(date):
+    """Day number of a date value, for window arithmetic"""
+    if isinstance(date, str) and len(date) == 10 and date[4] == '-' and date[7] == '-':
+        return date_type.fromisoformat(date).toordinal()
+    return pd.to_datetime(date).toordinal()
+
+
+# Items hash of a record without items, such as a bank statement row
+NO_ITEMS = items_hash('')
+
+
+class DuplicateIndex:
+    """Fingerprint index of stored expenses for O(1) duplicate lookups
+
+    Two expenses are duplicates when merchant, amount and items fingerprint
+    match and they share a date. An itemized receipt also duplicates one
+    saved on the only other date within window_days that has its
+    fingerprint, when that date has no further neighbours of its own: a
+    re-upload whose date was read differently. A fingerprint seen on
+    several nearby dates is a repeated purchase, not a duplicate. Entries
+    are bucketed by fingerprint and a window-wide day slot, so a lookup
+    probes five buckets whatever the ledger size.
+    """
+
+    def __init__(self, window_days=14):
+        self.window_days = window_days
+        self._slot_width = max(window_days, 1)
+        # (fingerprint, slot) -> {id: day}
+        self.buckets = {}
+
+    @classmethod
+    def from_records(cls, records, window_days=14):
+        """Build an index over stored records"""
+        index = cls(window_days)
+        for record in records:
+            index.add(record)
+        return index
+
+    def _key(self, record):
+        key = fingerprint(record)
+        if key is None:
+            return None, None
+        try:
+            return key, day_of(record.get('date'))
+        except (TypeError, ValueError):
+            return None, None
+
+    def add(self, record):
+        key, day = self._key(record)
+        if key is None:
+            return
+        self.buckets.setdefault((key, day // self._slot_width), {})[record.get('id')] = day
+
+    def remove(self, record):
+        key, day = self._key(record)
+        if key is None:
+            return
+        slot = (key, day // self._slot_width)
+        bucket = self.buckets.get(slot)
+        if bucket is not None:
+            bucket.pop(record.get('id'), None)
+            if not bucket:
+                del self.buckets[slot]
+
+    def find(self, record):
+        """Ids of indexed expenses that duplicate a record, closest date first"""
+        key, day = self._key(record)
+        if key is None:
+            return []
+        slot = day // self._slot_width
+        # Everything within two windows, so the neighbours of a match are seen too
+        nearby = [
+            (other_day, expense_id)
+            for neighbour in range(slot - 2, slot + 3)
+            for expense_id, other_day in self.buckets.get((key, neighbour), {}).items()
+            if expense_id != record.get('id')
+        ]
+        same_day = [expense_id for other_day, expense_id in nearby if other_day == day]
+        if same_day or key[2] == NO_ITEMS:
+            return same_day
+        
+        other_days = {other_day for other_day, _ in nearby if abs(other_day - day) <= self.window_days}
+        if len(other_days) != 1:
+            return []
+        match_day = other_days.pop()
+        if any(abs(other_day - match_day) <= self.window_days and other_day not in (day, match_day)
+               for other_day, _ in nearby):
+            return []
+        return [expense_id for other_day, expense_id in nearby if other_day == match_day]
+
+
+def find_duplicate_groups(expenses_df, window_days=14):
+    """Group a frame's expenses into duplicate clusters in O(n log n)
+
+    Applies the rule of DuplicateIndex to the whole history: rows sharing
+    a fingerprint and a date form a cluster, and two isolated dates of an
+    itemized fingerprint within window_days merge into one. Returns lists
+    of ids with more than one member, oldest first within each list.
+    """
+    if expenses_df.empty:
+        return []
+    df = pd.DataFrame({
+        'id': expenses_df['id'].values,
+        'merchant': normalize_merchant_series(expenses_df['merchant']).values,
+        'cents': (expenses_df['amount_cents'] if 'amount_cents' in expenses_df
+                  else cents_series(expenses_df['amount'])).astype('float64').values,
+        'items': [items_hash(items) for items in expenses_df['items']] if 'items' in expenses_df else NO_ITEMS,
+        'day': pd.to_datetime(expenses_df['date'], errors='coerce').values,
+    }).dropna(subset=['cents', 'day'])
+    df = df.sort_values(['merchant', 'cents', 'items', 'day'], kind='stable')
+    key_columns = ['merchant', 'cents', 'items']
+
+    # One row per fingerprint and date, with the gaps to its neighbouring dates
+    days = df.drop_duplicates(key_columns + ['day'])[key_columns + ['day']].reset_index(drop=True)
+    same_key = (days[key_columns] == days[key_columns].shift()).all(axis=1)
+    gap_previous = days['day'].diff().dt.days.where(same_key)
+    near_previous = gap_previous <= window_days
+    near_next = near_previous.shift(-1, fill_value=False)
+    # An itemized date pairs with the next one when both have no other near neighbour
+    starts_pair = (
+        near_next & ~near_previous & ~near_next.shift(-1, fill_value=False)
+        & (days['items'] != NO_ITEMS)
+    )
+    cluster = pd.Series(range(len(days)), index=days.index)
+    cluster[starts_pair.shift(fill_value=False)] -= 1
+    days['cluster'] = cluster
+
+    df = df.merge(days, on=key_columns + ['day'], how='left', sort=False)
+    df = df.sort_values(['cluster', 'day'], kind='stable')
+    sizes = df['cluster'].map(df['cluster'].value_counts())
+    groups = {}
+    for cluster_id, expense_id in zip(df['cluster'][sizes > 1], df['id'][sizes > 1]):
+        groups.setdefault(cluster_id, []).append(expense_id)
+    return list(groups.values())
@@ -0,0 +1,35 @@
+import json
+import zlib
+
+
+def stream_csv(batches):
+    """Yield CSV text for an iterable of DataFrame batches, header first"""
+    header = True
+    for batch in batches:
+        yield batch.to_csv(index=False, header=header)
+        header = False
+
+
+def stream_json(batches):
+    """Yield a JSON array of records for an iterable of DataFrame batches"""
+    yield "["
+    first = True
+    for batch in batches:
+        records = json.loads(batch.to_json(orient='records'))
+        if not records:
+            continue
+        text = ",\n".join(json.dumps(record) for record in records)
+        yield ("\n" if first else ",\n") + text
+        first = False
+    yield "\n]\n"
+
+
+def gzip_stream(chunks, level=6):
+    """Gzip-compress an iterable of text chunks incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
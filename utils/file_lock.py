@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Re-entrant inter-process lock held on a lock file
+
+    Uses flock() on POSIX and msvcrt.locking() on Windows. Threads of the
+    same process are serialized by an RLock first, since the OS lock is
+    owned per open file rather than per thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def _acquire_os_lock(self, fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            return
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after ~10s of retries; keep waiting
+                time.sleep(0.05)
+
+    def _release_os_lock(self, fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    self._acquire_os_lock(fd)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                self._fd = fd
+            self._depth += 1
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self._depth -= 1
+            if self._depth == 0:
+                fd, self._fd = self._fd, None
+                try:
+                    self._release_os_lock(fd)
+                finally:
+                    os.close(fd)
+        finally:
+            self._thread_lock.release()
+        return False
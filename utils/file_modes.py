@@ -0,0 +1,23 @@
+import os
+import stat
+
+# Read once at import: os.umask can only be read by setting it, which
+# would race with files other threads are creating
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def match_file_mode(tmp_path, path):
+    """Give a temp file the permissions path has, before renaming it over path
+
+    tempfile.mkstemp creates files as 0600; without this an atomic
+    rewrite would lock other accounts out of the file. A new path gets
+    the mode a plain open() would have created it with.
+    """
+    if os.name != 'posix':
+        return
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    os.chmod(tmp_path, mode)
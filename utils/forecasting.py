@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+from utils.money import cents_of
+
+# z score of the two-sided 80% prediction interval
+INTERVAL_Z = 1.2816
+SEASON = 12
+METHODS = ('seasonal_naive', 'exponential_smoothing', 'linear_trend')
+
+
+def monthly_category_totals(records):
+    """{month: {category: amount}} of expense records, summed in cents"""
+    totals = {}
+    for record in records:
+        cents = cents_of(record)
+        date = str(record.get('date') or '')
+        if cents is None or len(date) < 7:
+            continue
+        month = totals.setdefault(date[:7], {})
+        category = record.get('category', 'Other')
+        month[category] = month.get(category, 0) + cents
+    return {month: {category: cents / 100 for category, cents in categories.items()}
+            for month, categories in totals.items()}
+
+
+def last_complete_month(today=None):
+    """Period of the last calendar month that has fully passed"""
+    return pd.Period(pd.Timestamp.today() if today is None else pd.Timestamp(today), freq='M') - 1
+
+
+def complete_month_totals(month_totals, today=None):
+    """month_totals without the current, unfinished month or any later one"""
+    last = str(last_complete_month(today))
+    return {month: totals for month, totals in month_totals.items() if month <= last}
+
+
+def monthly_matrix(month_totals, last_month=None):
+    """(categories, months, matrix) with one row per category and one column per month
+
+    Months run contiguously from the first month given to last_month
+    (default: the last month given), so months without spending count as
+    zero.
+    """
+    months = sorted(month_totals)
+    periods = pd.period_range(months[0], last_month or months[-1], freq='M')
+    categories = sorted({category for totals in month_totals.values() for category in totals})
+    row = {category: i for i, category in enumerate(categories)}
+    column = {str(period): j for j, period in enumerate(periods)}
+    matrix = np.zeros((len(categories), len(periods)))
+    for month, totals in month_totals.items():
+        for category, amount in totals.items():
+            matrix[row[category], column[month]] = amount
+    return categories, [str(period) for period in periods], matrix
+
+
+def seasonal_naive(matrix, season=SEASON, horizon=1):
+    """(one-step predictions, forecast horizon months ahead) repeating the value of one season ago"""
+    k, m = matrix.shape
+    predictions = np.full((k, m), np.nan)
+    if m > season:
+        predictions[:, season:] = matrix[:, :m - season]
+    source = m - season + horizon - 1
+    forecast = matrix[:, source] if 0 <= source < m else np.full(k, np.nan)
+    return predictions, forecast
+
+
+def exponential_smoothing(matrix, alpha=0.3, horizon=1):
+    """(one-step predictions, forecast horizon months ahead) of simple exponential smoothing
+
+    The smoothed level is the forecast for every horizon.
+    """
+    k, m = matrix.shape
+    predictions = np.full((k, m), np.nan)
+    level = matrix[:, 0].copy()
+    for t in range(1, m):
+        predictions[:, t] = level
+        level = alpha * matrix[:, t] + (1 - alpha) * level
+    return predictions, level
+
+
+def linear_trend(matrix, horizon=1):
+    """(one-step predictions, forecast horizon months ahead) of a least-squares line over the months so far
+
+    The fit on months 0..t-1 for every t comes from running sums, so all
+    expanding-window fits of all categories cost one pass.
+    """
+    k, m = matrix.shape
+    t = np.arange(m + 1, dtype=float)
+    # Sums over the n = t points before each step
+    n = t
+    sum_t = np.concatenate(([0.0], np.cumsum(t[:-1])))
+    sum_tt = np.concatenate(([0.0], np.cumsum(t[:-1] ** 2)))
+    zeros = np.zeros((k, 1))
+    sum_y = np.hstack([zeros, np.cumsum(matrix, axis=1)])
+    sum_ty = np.hstack([zeros, np.cumsum(matrix * t[:-1], axis=1)])
+    denominator = n * sum_tt - sum_t ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(denominator > 0, (n * sum_ty - sum_t * sum_y) / denominator, np.nan)
+        intercept = (sum_y - slope * sum_t) / n
+    fitted = intercept + slope * t
+    return fitted[:, :m], intercept[:, m] + slope[:, m] * (m + horizon - 1)
+
+
+def forecast_next_month(month_totals, interval_z=INTERVAL_Z, today=None):
+    """Forecast next calendar month's spending per category with prediction intervals
+
+    Only complete months are used: the current month is still running,
+    so it is dropped, and months between the last spending and today
+    count as zero. The forecast is therefore two steps past the history.
+    Every method is run on all categories at once. Per category, the
+    method with the lowest mean absolute one-step error over the months
+    all methods can predict is used, and the spread of its errors sets the
+    interval. Returns {'month', 'predicted_total', 'lower', 'upper',
+    'categories': {category: {'predicted', 'lower', 'upper', 'method'}}}.
+    """
+    last_month = last_complete_month(today)
+    target = str(last_month + 2)
+    month_totals = complete_month_totals(month_totals, today)
+    if not month_totals:
+        return {'month': target, 'predicted_total': 0.0, 'lower': 0.0, 'upper': 0.0, 'categories': {}}
+    categories, months, matrix = monthly_matrix(month_totals, str(last_month))
+    k, m = matrix.shape
+
+    horizon = 2
+    runs = [seasonal_naive(matrix, horizon=horizon), exponential_smoothing(matrix, horizon=horizon),
+            linear_trend(matrix, horizon=horizon)]
+    predictions = np.stack([run[0] for run in runs])
+    forecasts = np.stack([run[1] for run in runs])
+    # Compare methods on the months every usable method predicts
+    start = SEASON if m > SEASON else min(2, m - 1)
+    errors = predictions[:, :, start:] - matrix[:, start:]
+    scores = np.abs(errors).mean(axis=2) if errors.shape[2] else np.full((len(METHODS), k), np.nan)
+    scores = np.where(np.isnan(scores) | np.isnan(forecasts), np.inf, scores)
+    # Exponential smoothing is always defined, so it is the fallback
+    scores[1] = np.where(np.isinf(scores[1]), np.finfo(float).max, scores[1])
+    best = np.argmin(scores, axis=0)
+
+    columns = np.arange(k)
+    predicted = np.maximum(forecasts[best, columns], 0.0)
+    chosen_errors = errors[best, columns]
+    known = ~np.isnan(chosen_errors)
+    squared = np.where(known, chosen_errors, 0.0) ** 2
+    # Root mean squared one-step error; zero when nothing could be checked yet
+    spread = np.sqrt(squared.sum(axis=1) / np.maximum(known.sum(axis=1), 1))
+    lower = np.maximum(predicted - interval_z * spread, 0.0)
+    upper = predicted + interval_z * spread
+
+    # Category errors are treated as independent for the total's interval
+    total_spread = float(np.sqrt(np.sum(spread ** 2)))
+    predicted_total = float(predicted.sum())
+    return {
+        'month': target,
+        'predicted_total': round(predicted_total, 2),
+        'lower': round(max(predicted_total - interval_z * total_spread, 0.0), 2),
+        'upper': round(predicted_total + interval_z * total_spread, 2),
+        'categories': {
+            category: {
+                'predicted': round(float(predicted[i]), 2),
+                'lower': round(float(lower[i]), 2),
+                'upper': round(float(upper[i]), 2),
+                'method': METHODS[best[i]]
+            }
+            for i, category in enumerate(categories)
+        }
+    }
+
+
+def rising_categories(forecast, month_totals, limit=2, today=None):
+    """Categories whose forecast grows the most over the last complete month"""
+    latest = month_totals.get(str(last_complete_month(today)), {})
+    growth = {
+        category: stats['predicted'] - latest.get(category, 0)
+        for category, stats in forecast['categories'].items()
+    }
+    return [category for category, change in sorted(growth.items(), key=lambda x: x[1], reverse=True)
+            if change > 0][:limit]
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+from utils.money import cents_series
+
+# Component weights; components that cannot be computed are left out and
+# the remaining weights are rescaled
+HEALTH_WEIGHTS = {
+    'budget_adherence': 0.35,
+    'volatility': 0.25,
+    'concentration': 0.2,
+    'trend': 0.2,
+}
+DAYS_PER_MONTH = 365.25 / 12
+
+
+def _scale(value, best, worst):
+    """Score 100 at best, 0 at worst, linear in between and clipped"""
+    if best == worst:
+        return 100.0
+    return float(np.clip((worst - value) / (worst - best), 0.0, 1.0) * 100)
+
+
+def health_rating(score):
+    """Word rating of a health score"""
+    if score >= 80:
+        return "excellent"
+    if score >= 60:
+        return "good"
+    return "needs attention"
+
+
+def spending_health_score(expenses_df, monthly_budget=None, start_date=None, end_date=None):
+    """Deterministic 0-100 spending health score of a frame of expenses
+
+    The frame needs date, category and amount_cents (or amount) columns;
+    the range defaults to its first and last date. Components, each 0-100:
+
+    - budget_adherence: spending against monthly_budget prorated to the
+      range; 100 up to 80% of budget, 0 at 150%. Skipped without a budget.
+    - volatility: coefficient of variation of weekly totals; 100 up to
+      0.25, 0 from 1.5. Needs two weeks.
+    - concentration: Herfindahl index of category shares; 100 up to 0.2
+      (five even categories), 0 when one category takes everything. Needs
+      five expenses.
+    - trend: least-squares weekly growth relative to the mean week; 100 for
+      flat or falling spending, 0 from +10% a week. Needs three weeks.
+
+    Returns {'score', 'rating', 'components': {name: {'score', 'value',
+    'weight'}}}, with weights rescaled over the components present, or a
+    neutral 50 rated 'unknown' when no component can be computed.
+    """
+    empty = {'score': 50, 'rating': 'unknown', 'components': {}}
+    if expenses_df is None or len(expenses_df) == 0:
+        return empty
+
+    cents = (expenses_df['amount_cents'] if 'amount_cents' in expenses_df
+             else cents_series(expenses_df['amount']))
+    df = pd.DataFrame({
+        'date': pd.to_datetime(expenses_df['date'], errors='coerce').values,
+        'cents': pd.to_numeric(cents, errors='coerce').astype('float64').values,
+        'category': expenses_df['category'].astype(object).fillna('Other').values,
+    }).dropna(subset=['date', 'cents'])
+    if df.empty:
+        return empty
+
+    start = pd.Timestamp(start_date) if start_date is not None else df['date'].min()
+    end = pd.Timestamp(end_date) if end_date is not None else df['date'].max()
+    days = max((end - start).days + 1, 1)
+    total = df['cents'].sum()
+    components = {}
+
+    if monthly_budget:
+        ratio = total / 100 / (monthly_budget * days / DAYS_PER_MONTH)
+        components['budget_adherence'] = (_scale(ratio, 0.8, 1.5), round(float(ratio), 3))
+
+    # Totals of the full weeks counted back from the end of the range, oldest
+    # first; weeks without spending count as zero
+    weeks = days // 7
+    week = ((end - df['date']).dt.days // 7).to_numpy()
+    in_range = (week >= 0) & (week < weeks)
+    weekly = np.bincount(week[in_range], weights=df['cents'].to_numpy()[in_range], minlength=weeks)[::-1]
+    mean_week = weekly.mean() if weeks else 0.0
+    if len(weekly) >= 2 and mean_week > 0:
+        variation = weekly.std() / mean_week
+        components['volatility'] = (_scale(variation, 0.25, 1.5), round(float(variation), 3))
+    if len(weekly) >= 3 and mean_week > 0:
+        growth = np.polyfit(np.arange(len(weekly)), weekly, 1)[0] / mean_week
+        components['trend'] = (_scale(growth, 0.0, 0.1), round(float(growth), 4))
+
+    if total > 0 and len(df) >= 5:
+        shares = df.groupby('category')['cents'].sum().to_numpy() / total
+        herfindahl = float(np.sum(shares ** 2))
+        components['concentration'] = (_scale(herfindahl, 0.2, 1.0), round(herfindahl, 3))
+
+    if not components:
+        return empty
+    weight_sum = sum(HEALTH_WEIGHTS[name] for name in components)
+    score = sum(HEALTH_WEIGHTS[name] * component[0] for name, component in components.items()) / weight_sum
+    score = int(round(score))
+    return {
+        'score': score,
+        'rating': health_rating(score),
+        'components': {
+            name: {
+                'score': int(round(component[0])),
+                'value': component[1],
+                'weight': round(HEALTH_WEIGHTS[name] / weight_sum, 3)
+            }
+            for name, component in components.items()
+        }
+    }
@@ -0,0 +1,177 @@
+import json
+import os
+import re
+import tempfile
+from collections import Counter
+
+from utils.file_modes import match_file_mode
+
+
+# Digits OCR commonly reads in place of letters inside words
+OCR_LETTERS = str.maketrans({'0': 'o', '1': 'l', '5': 's', '8': 'b'})
+
+
+def is_store_number(token):
+    """Whether a name token is a store number (#12) or a long digit run (store id, phone number)"""
+    digits = token.lstrip('#')
+    return digits.isdigit() and (token.startswith('#') or len(digits) >= 4)
+
+
+def match_key(merchant):
+    """Lowercase merchant name without punctuation or store numbers
+
+    Short numbers that are part of the name, as in "Studio 54", are kept.
+    """
+    tokens = [token for token in str(merchant or '').lower().split() if not is_store_number(token)]
+    text = re.sub(r'[^\w\s]', ' ', ' '.join(tokens))
+    return ' '.join(token if token.isdigit() else token.translate(OCR_LETTERS) for token in text.split())
+
+
+def numbers(words):
+    """Number tokens among a set of match key words"""
+    return {word for word in words if word.isdigit()}
+
+
+def trigrams(key):
+    """Set of character trigrams of a match key, padded at the ends"""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MerchantDictionary:
+    """Persistent map of raw merchant names to canonical ones
+
+    Known spellings resolve with one dict lookup. Unknown ones are compared
+    against the canonical names sharing at least one trigram, found through
+    an inverted trigram index, and aliased to the most similar one when its
+    Dice similarity reaches threshold; otherwise they become canonical
+    themselves. A name whose words are a strict subset or superset of a
+    canonical name's ("Uber" and "Uber Eats"), or whose numbers differ
+    ("Studio 54" and "Studio 8"), is a different merchant and never
+    aliased to it.
+    """
+
+    def __init__(self, path="merchants.json", threshold=0.6):
+        self.path = path
+        self.threshold = threshold
+        # match key -> canonical display name
+        self.aliases = {}
+        self.canonical = []
+        # trigram sets of the canonical names, by position in self.canonical
+        self._grams = []
+        # word sets of the canonical names' match keys, by position
+        self._words = []
+        self._postings = {}
+        # (mtime, size) of the file as last read
+        self._file_identity = None
+        self.refresh()
+
+    def refresh(self):
+        """Merge in entries other processes saved since the file was last read"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        identity = (st.st_mtime_ns, st.st_size)
+        if identity == self._file_identity:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading merchant dictionary: {e}")
+            return
+        self._file_identity = identity
+        for name in data.get('canonical', []):
+            self._add_canonical(name)
+        for key, name in data.get('aliases', {}).items():
+            self.aliases.setdefault(key, name)
+
+    def save(self):
+        """Atomically write the dictionary to path, merged with what is on disk
+
+        Callers hold the ledger's writer lock, so no other process saves
+        between the merge and the rename.
+        """
+        try:
+            self.refresh()
+            data = {'canonical': self.canonical, 'aliases': dict(sorted(self.aliases.items()))}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+            match_file_mode(tmp_path, self.path)
+            os.replace(tmp_path, self.path)
+            st = os.stat(self.path)
+            self._file_identity = (st.st_mtime_ns, st.st_size)
+            return True
+        except Exception as e:
+            print(f"Error saving merchant dictionary: {e}")
+            return False
+
+    def _add_canonical(self, name):
+        key = match_key(name)
+        if not key or key in self.aliases:
+            return
+        position = len(self.canonical)
+        grams = trigrams(key)
+        self.canonical.append(name)
+        self._grams.append(grams)
+        self._words.append(set(key.split()))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(position)
+        self.aliases[key] = name
+
+    def best_match(self, merchant):
+        """(canonical name, similarity) of the closest known merchant, or (None, 0.0)"""
+        key = match_key(merchant)
+        if not key:
+            return None, 0.0
+        if key in self.aliases:
+            return self.aliases[key], 1.0
+
+        grams = trigrams(key)
+        words = set(key.split())
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        best, best_score = None, 0.0
+        for position, count in shared.items():
+            other = self._words[position]
+            if words < other or words > other or numbers(words) != numbers(other):
+                continue
+            score = 2 * count / (len(grams) + len(self._grams[position]))
+            if score > best_score:
+                best, best_score = position, score
+        if best is None:
+            return None, 0.0
+        return self.canonical[best], best_score
+
+    def resolve(self, merchant, learn=True):
+        """Canonical name of a raw merchant name
+
+        With learn, a new spelling is remembered as an alias of its match,
+        or as a new canonical merchant; call save() to persist it.
+        """
+        if not isinstance(merchant, str) or not merchant.strip():
+            return merchant
+        key = match_key(merchant)
+        if key in self.aliases:
+            return self.aliases[key]
+
+        name, score = self.best_match(merchant)
+        if name is None or score < self.threshold:
+            # Drop store numbers and similar references from the display name
+            name = ' '.join(t for t in merchant.split() if not is_store_number(t)) or ' '.join(merchant.split())
+            if learn:
+                self._add_canonical(name)
+            return name
+        if learn:
+            self.aliases[key] = name
+        return name
+
+    def add_alias(self, merchant, canonical):
+        """Map a raw merchant name to a canonical one, adding the canonical name if new"""
+        if match_key(canonical) not in self.aliases:
+            self._add_canonical(canonical)
+        self.aliases[match_key(merchant)] = self.aliases[match_key(canonical)]
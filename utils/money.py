@@ -0,0 +1,98 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import pandas as pd
+
+CENT = Decimal('0.01')
+
+
+def to_cents(value):
+    """Integer cents of a money amount given as a number or numeric string
+
+    Goes through the decimal text of the value, so 0.1 + 0.2 style float
+    noise never leaks into the stored amount. Raises ValueError when the
+    value is not numeric.
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"invalid amount: {value!r}")
+    if isinstance(value, int):
+        return value * 100
+    try:
+        amount = Decimal(str(value).strip().replace(',', '').lstrip('$'))
+    except InvalidOperation:
+        raise ValueError(f"invalid amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"invalid amount: {value!r}")
+    return int(amount.quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def cents_of(record):
+    """Cents of a record (stored amount_cents, else its legacy amount), or None when not numeric"""
+    cents = record.get('amount_cents')
+    if cents is not None and not pd.isna(cents):
+        return int(cents)
+    try:
+        return to_cents(record.get('amount'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _cents_or_na(value):
+    try:
+        return to_cents(value)
+    except (TypeError, ValueError):
+        return pd.NA
+
+
+def cents_series(amounts):
+    """Cents of a Series of money amounts; Int64 with <NA> for non-numeric values
+
+    Follows to_cents exactly ("$1,234.50" is accepted, halves round up),
+    converting each distinct value once.
+    """
+    codes, values = pd.factorize(amounts.astype(object), use_na_sentinel=True)
+    cents = pd.array([_cents_or_na(value) for value in values] + [pd.NA], dtype='Int64')
+    # Code -1 (missing) picks the trailing <NA>
+    return pd.Series(cents[codes], index=amounts.index)
+
+
+def from_cents(cents):
+    """Amount in currency units of integer cents, for display"""
+    return cents / 100
+
+
+def format_cents(cents):
+    """Format integer cents as $1,234.56 without going through a float"""
+    sign = '-' if cents < 0 else ''
+    units, rest = divmod(abs(int(cents)), 100)
+    return f"{sign}${units:,}.{rest:02d}"
+
+
+def store_cents(record):
+    """Move a record's amount onto integer amount_cents, in place
+
+    A present amount wins over amount_cents, so edits made to the display
+    column of a loaded frame are kept.
+    """
+    if 'amount' in record:
+        amount = record.pop('amount')
+        try:
+            record['amount_cents'] = to_cents(amount)
+        except (TypeError, ValueError):
+            record.setdefault('amount_cents', None)
+    cents = record.get('amount_cents')
+    if cents is not None:
+        record['amount_cents'] = None if pd.isna(cents) else int(cents)
+    return record
+
+
+def add_display_amounts(df):
+    """Fill a frame's amount column from amount_cents, converting legacy float amounts"""
+    if 'amount' in df.columns:
+        legacy = cents_series(df['amount'])
+        if 'amount_cents' in df.columns:
+            df['amount_cents'] = df['amount_cents'].astype('Int64').fillna(legacy)
+        else:
+            df['amount_cents'] = legacy
+    if 'amount_cents' in df.columns:
+        df['amount_cents'] = df['amount_cents'].astype('Int64')
+        df['amount'] = df['amount_cents'].astype('float64') / 100
+    return df
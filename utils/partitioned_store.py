@@ -0,0 +1,358 @@
+import json
+import os
+import uuid
+import tempfile
+import pandas as pd
+
+from utils.sqlite_store import COLUMNS, projected_columns
+from utils.money import cents_of, store_cents, add_display_amounts
+from utils.file_modes import match_file_mode
+
+
+def _normalize_date(value):
+    """YYYY-MM-DD string of a date value"""
+    if isinstance(value, str) and len(value) == 10 and value[4] == '-' and value[7] == '-':
+        return value
+    return pd.to_datetime(value).strftime('%Y-%m-%d')
+
+
+def _normalize_record(record):
+    """Copy of a record with a normalized date and a legacy float amount stored as cents"""
+    record = store_cents(dict(record))
+    record['date'] = _normalize_date(record.get('date'))
+    return record
+
+
+def _cents(record):
+    return cents_of(record) or 0
+
+
+def _frame(records, columns):
+    """Expense frame of stored records with amount derived from amount_cents"""
+    df = add_display_amounts(pd.DataFrame(records))
+    for column in columns:
+        if column not in df.columns:
+            df[column] = None
+    return df
+
+
+def _atomic_write(path, text):
+    """Write text to path through an fsynced temp file and rename"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        match_file_mode(tmp_path, path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class PartitionedStore:
+    """Expense storage split into one JSON Lines file per month
+
+    manifest.json records the row count and total of every partition, so
+    range reads open only the months that overlap the range and appends
+    only touch the partition of the record's month.
+    """
+
+    def __init__(self, directory="expenses_partitions"):
+        self.directory = directory
+        self.manifest_file = os.path.join(directory, "manifest.json")
+        os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(self.manifest_file):
+            self._write_manifest({})
+        # (manifest identity, {id: month}), built on the first id lookup
+        self._locations = None
+
+    def storage_paths(self):
+        """Files whose changes mean the stored data changed"""
+        # Every write rewrites the manifest
+        return [self.manifest_file]
+
+    def _manifest_identity(self):
+        st = os.stat(self.manifest_file)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def read_manifest(self):
+        """{month: {'rows': n, 'total_cents': cents}} for every partition"""
+        with open(self.manifest_file, 'r') as f:
+            return json.load(f)
+
+    def _write_manifest(self, partitions):
+        _atomic_write(self.manifest_file, json.dumps(dict(sorted(partitions.items())), indent=2))
+
+    def _partition_file(self, month):
+        return os.path.join(self.directory, f"{month}.jsonl")
+
+    def _read_partition(self, month):
+        path = self._partition_file(month)
+        if not os.path.exists(path):
+            return []
+        records = []
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"Skipping corrupt line in {path}")
+        return records
+
+    def _write_partition(self, month, records):
+        path = self._partition_file(month)
+        if not records:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        _atomic_write(path, "".join(json.dumps(r, default=str) + "\n" for r in records))
+
+    def _append_partition(self, month, records):
+        with open(self._partition_file(month), 'a') as f:
+            f.write("".join(json.dumps(r, default=str) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _set_partition_stats(partitions, month, records):
+        if records:
+            partitions[month] = {'rows': len(records), 'total_cents': sum(_cents(r) for r in records)}
+        else:
+            partitions.pop(month, None)
+
+    def months_between(self, start_date=None, end_date=None):
+        """Partitions overlapping a date range, oldest first"""
+        start = _normalize_date(start_date)[:7] if start_date is not None else None
+        end = _normalize_date(end_date)[:7] if end_date is not None else None
+        return [
+            month for month in sorted(self.read_manifest())
+            if (start is None or month >= start) and (end is None or month <= end)
+        ]
+
+    def count(self):
+        """Number of stored expenses, from the manifest"""
+        return sum(p['rows'] for p in self.read_manifest().values())
+
+    def select(self, start_date=None, end_date=None, categories=None, merchants=None, columns=None):
+        """Select expenses as a DataFrame, reading only partitions in the date range"""
+        columns = projected_columns(columns)
+        records = []
+        for month in self.months_between(start_date, end_date):
+            records.extend(self._read_partition(month))
+        if not records:
+            return pd.DataFrame(columns=columns)
+
+        df = _frame(records, COLUMNS)
+        mask = pd.Series(True, index=df.index)
+        if start_date is not None:
+            mask &= df['date'] >= _normalize_date(start_date)
+        if end_date is not None:
+            mask &= df['date'] <= _normalize_date(end_date)
+        if categories:
+            mask &= df['category'].isin(categories)
+        if merchants:
+            mask &= df['merchant'].isin(merchants)
+        df = df.loc[mask].sort_values('date', ascending=False, kind='stable')
+        return df[columns].reset_index(drop=True)
+
+    def iter_batches(self, batch_size=5000, columns=None):
+        """Yield expenses as DataFrames of batch_size rows, newest month first
+
+        Only one partition plus a partial batch is held in memory at a time.
+        """
+        columns = projected_columns(columns)
+
+        pending = pd.DataFrame(columns=columns)
+        for month in reversed(self.months_between()):
+            records = self._read_partition(month)
+            if not records:
+                continue
+            df = _frame(records, columns)
+            df = df.sort_values('date', ascending=False, kind='stable')[columns]
+            pending = df if pending.empty else pd.concat([pending, df], ignore_index=True)
+            while len(pending) >= batch_size:
+                yield pending.iloc[:batch_size].reset_index(drop=True)
+                pending = pending.iloc[batch_size:]
+        if not pending.empty:
+            yield pending.reset_index(drop=True)
+
+    def insert(self, records):
+        """Append records to their month partitions and update the manifest"""
+        if self._locations is not None and self._locations[0] != self._manifest_identity():
+            self._locations = None
+        by_month = {}
+        for record in records:
+            record = _normalize_record(record)
+            by_month.setdefault(record['date'][:7], []).append(record)
+
+        partitions = self.read_manifest()
+        for month, month_records in by_month.items():
+            self._append_partition(month, month_records)
+            stats = partitions.setdefault(month, {'rows': 0, 'total_cents': 0})
+            stats['rows'] += len(month_records)
+            stats['total_cents'] = stats.get('total_cents', 0) + sum(_cents(r) for r in month_records)
+        self._write_manifest(partitions)
+
+        if self._locations is not None:
+            locations = self._locations[1]
+            for month, month_records in by_month.items():
+                for record in month_records:
+                    locations[record.get('id')] = month
+            self._locations = (self._manifest_identity(), locations)
+
+    def replace_all(self, records):
+        """Replace every partition with the given records"""
+        self.clear()
+        self.insert(records)
+
+    def clear(self):
+        """Delete all partitions"""
+        for month in self.read_manifest():
+            self._write_partition(month, [])
+        self._write_manifest({})
+        self._locations = None
+
+    def _locate(self, expense_id):
+        """Month partition holding an expense id, or None"""
+        identity = self._manifest_identity()
+        if self._locations is None or self._locations[0] != identity:
+            locations = {}
+            for month in self.read_manifest():
+                for record in self._read_partition(month):
+                    locations[record.get('id')] = month
+            self._locations = (identity, locations)
+        return self._locations[1].get(expense_id)
+
+    def get(self, expense_id):
+        """Fetch one expense by id as a dict, or None"""
+        month = self._locate(expense_id)
+        if month is None:
+            return None
+        for record in self._read_partition(month):
+            if record.get('id') == expense_id:
+                return record
+        return None
+
+    def select_ids(self, ids, columns=None):
+        """Select the expenses with the given ids as a DataFrame, reading only their partitions"""
+        columns = projected_columns(columns)
+        ids = set(ids)
+        months = {self._locate(expense_id) for expense_id in ids} - {None}
+        records = [
+            record for month in months for record in self._read_partition(month)
+            if record.get('id') in ids
+        ]
+        if not records:
+            return pd.DataFrame(columns=columns)
+        df = _frame(records, columns)
+        df = df.sort_values('date', ascending=False, kind='stable')
+        return df[columns].reset_index(drop=True)
+    
+    def _rewrite_months(self, changed):
+        """Write changed {month: records} partitions and their manifest stats"""
+        partitions = self.read_manifest()
+        for month, records in changed.items():
+            self._write_partition(month, records)
+            self._set_partition_stats(partitions, month, records)
+        self._write_manifest(partitions)
+        self._locations = None
+
+    def delete(self, expense_id):
+        """Delete an expense by id, rewriting only its partition"""
+        month = self._locate(expense_id)
+        if month is None:
+            return False
+        records = self._read_partition(month)
+        remaining = [r for r in records if r.get('id') != expense_id]
+        if len(remaining) == len(records):
+            return False
+        self._rewrite_months({month: remaining})
+        return True
+
+    def update(self, expense_id, updated_data):
+        """Update fields of an expense by id, moving it if its month changes"""
+        month = self._locate(expense_id)
+        if month is None:
+            return False
+        records = self._read_partition(month)
+        for i, record in enumerate(records):
+            if record.get('id') == expense_id:
+                break
+        else:
+            return False
+
+        updated = _normalize_record(dict(record, **updated_data))
+        new_month = updated['date'][:7]
+        if new_month == month:
+            records[i] = updated
+            self._rewrite_months({month: records})
+        else:
+            del records[i]
+            self._rewrite_months({month: records, new_month: self._read_partition(new_month) + [updated]})
+        return True
+
+    def backfill_ids(self):
+        """Assign random ids to records stored without one"""
+        changed = {}
+        count = 0
+        for month in self.read_manifest():
+            records = self._read_partition(month)
+            missing = [r for r in records if not r.get('id')]
+            for record in missing:
+                record['id'] = uuid.uuid4().hex
+            if missing:
+                changed[month] = records
+                count += len(missing)
+        if changed:
+            self._rewrite_months(changed)
+        return count
+
+    def migrate_amounts(self):
+        """Rewrite partitions holding float amounts with integer cents; returns records converted"""
+        partitions = self.read_manifest()
+        changed = {}
+        count = 0
+        for month, stats in partitions.items():
+            records = self._read_partition(month)
+            legacy = sum(1 for r in records if 'amount' in r)
+            if legacy or 'total_cents' not in stats:
+                changed[month] = [_normalize_record(r) for r in records]
+                count += legacy
+        if changed:
+            self._rewrite_months(changed)
+        return count
+    
+    def group_stats(self):
+        """(grouping, key, sum, count, min, max) rows in cents for every aggregate group"""
+        df = self.select(columns=['amount_cents', 'date', 'category'])
+        df = df.dropna(subset=['amount_cents'])
+        if df.empty:
+            return []
+        df = df.assign(amount_cents=df['amount_cents'].astype('int64'), month=df['date'].str[:7])
+        rows = []
+        for grouping, keys in (('category', 'category'), ('month', 'month'),
+                               ('month_category', ['month', 'category'])):
+            stats = df.groupby(keys)['amount_cents'].agg(['sum', 'count', 'min', 'max'])
+            for key, row in stats.iterrows():
+                rows.append((grouping, key, int(row['sum']), int(row['count']), int(row['min']), int(row['max'])))
+        return rows
+
+    def group_extremes(self, grouping, key):
+        """(min, max) amount in cents of one aggregate group"""
+        if grouping == 'category':
+            records = self.select(categories=[key], columns=['amount_cents']).to_dict('records')
+        elif grouping == 'month':
+            records = self._read_partition(key)
+        else:
+            month, category = key
+            records = [r for r in self._read_partition(month) if r.get('category') == category]
+        amounts = [cents for cents in (cents_of(r) for r in records) if cents is not None]
+        if not amounts:
+            return (None, None)
+        return (min(amounts), max(amounts))
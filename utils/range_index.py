@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+# Columns needed to build a DateRangeIndex
+RANGE_COLUMNS = ['date', 'amount_cents', 'category']
+
+
+def day_number(value):
+    """Day number (days since 1970-01-01) of a date value"""
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype('int64'))
+
+
+def _prefix(values):
+    """Cumulative sums with a leading zero, so sum(values[lo:hi]) = prefix[hi] - prefix[lo]"""
+    return np.concatenate(([0], np.cumsum(values, dtype='int64')))
+
+
+class DayTotals:
+    """Per-day totals and counts of one series of expenses, with prefix sums over days"""
+
+    def __init__(self, days, totals, counts):
+        self.days = days
+        self.cum_totals = _prefix(totals)
+        self.cum_counts = _prefix(counts)
+
+    def span(self, start_day, end_day):
+        """[lo, hi) positions of the days within an inclusive day range"""
+        lo = 0 if start_day is None else int(np.searchsorted(self.days, start_day, 'left'))
+        hi = len(self.days) if end_day is None else int(np.searchsorted(self.days, end_day, 'right'))
+        return lo, max(lo, hi)
+
+    def totals(self, lo, hi):
+        """(sum in cents, count) of the days in [lo, hi)"""
+        return (int(self.cum_totals[hi] - self.cum_totals[lo]),
+                int(self.cum_counts[hi] - self.cum_counts[lo]))
+
+
+class DateRangeIndex:
+    """Date-sorted prefix sums of spending, overall and per category
+
+    Expenses are folded into one row per day, so the index is as long as
+    the number of distinct days, not expenses. A date range becomes two
+    binary searches and a subtraction of prefix sums; the largest expense
+    of a range comes from a sparse table of daily maxima in O(1).
+    """
+
+    def __init__(self, overall, maxima, categories):
+        self.overall = overall
+        self.categories = categories
+        # sparse[k][i] = largest expense among days i .. i + 2**k - 1
+        self.sparse = [maxima]
+        width = 1
+        while width * 2 <= len(maxima):
+            previous = self.sparse[-1]
+            self.sparse.append(np.maximum(previous[:-width], previous[width:]))
+            width *= 2
+
+    @classmethod
+    def from_frame(cls, expenses_df):
+        """Build an index from a frame with date, amount_cents and category columns"""
+        df = pd.DataFrame({
+            'day': pd.to_datetime(expenses_df['date'], errors='coerce').values,
+            'cents': pd.to_numeric(expenses_df['amount_cents'], errors='coerce'),
+            'category': expenses_df['category'].astype(object).fillna('Other').values,
+        }).dropna(subset=['day', 'cents'])
+        df = df.assign(
+            day=df['day'].values.astype('datetime64[D]').astype('int64'),
+            cents=df['cents'].astype('int64')
+        )
+
+        daily = df.groupby('day')['cents'].agg(['sum', 'count', 'max'])
+        overall = DayTotals(daily.index.to_numpy(), daily['sum'].to_numpy(), daily['count'].to_numpy())
+        categories = {}
+        per_category = df.groupby(['category', 'day'])['cents'].agg(['sum', 'count'])
+        for category, rows in per_category.groupby(level='category'):
+            categories[category] = DayTotals(
+                rows.index.get_level_values('day').to_numpy(), rows['sum'].to_numpy(), rows['count'].to_numpy()
+            )
+        return cls(overall, daily['max'].to_numpy(), categories)
+
+    def _range_max(self, lo, hi):
+        if hi <= lo:
+            return None
+        level = (hi - lo).bit_length() - 1
+        table = self.sparse[level]
+        return int(max(table[lo], table[hi - (1 << level)]))
+
+    def summary(self, start_date=None, end_date=None):
+        """Spending between two inclusive dates, in cents
+
+        Returns {'sum', 'count', 'days', 'max', 'categories'}, where days
+        counts the days with at least one expense and categories maps each
+        category with spending in the range to its {'sum', 'count'}.
+        """
+        start_day = day_number(start_date) if start_date is not None else None
+        end_day = day_number(end_date) if end_date is not None else None
+        lo, hi = self.overall.span(start_day, end_day)
+        total, count = self.overall.totals(lo, hi)
+        categories = {}
+        for category, totals in self.categories.items():
+            category_total, category_count = totals.totals(*totals.span(start_day, end_day))
+            if category_count:
+                categories[category] = {'sum': category_total, 'count': category_count}
+        return {
+            'sum': total,
+            'count': count,
+            'days': hi - lo,
+            'max': self._range_max(lo, hi),
+            'categories': categories,
+        }
@@ -0,0 +1,98 @@
+import pandas as pd
+
+from utils.money import cents_series
+from utils.duplicates import normalize_merchant_series
+
+# Columns needed to detect recurring charges
+RECURRING_COLUMNS = ['merchant', 'date', 'amount_cents', 'category']
+
+# period name -> (length in days, allowed deviation of an interval in days)
+PERIODS = {
+    'weekly': (7.0, 1.5),
+    'monthly': (365.25 / 12, 4.0),
+    'annual': (365.25, 15.0),
+}
+DAYS_PER_MONTH = 365.25 / 12
+
+
+def find_recurring_expenses(expenses_df, min_occurrences=3, min_regular_share=0.75,
+                            max_amount_variation=0.2, as_of=None):
+    """Periodic charges of a frame of expenses, largest monthly cost first
+
+    Expenses are grouped by normalized merchant and sorted by date once;
+    the gaps between consecutive charges of a merchant are compared with
+    every period at the same time. A merchant recurs with a period when at
+    least min_regular_share of its gaps are within that period's deviation
+    and the coefficient of variation of its amounts is at most
+    max_amount_variation. Annual charges need two occurrences, the others
+    min_occurrences.
+
+    Returns dicts with merchant, category, period, interval_days, amount
+    (median charge), monthly_cost, occurrences, last_date, next_date and
+    active (a charge seen within 1.5 periods of as_of, default today).
+    """
+    if expenses_df is None or len(expenses_df) == 0:
+        return []
+    cents = (expenses_df['amount_cents'] if 'amount_cents' in expenses_df
+             else cents_series(expenses_df['amount']))
+    df = pd.DataFrame({
+        'key': normalize_merchant_series(expenses_df['merchant']).values,
+        'merchant': expenses_df['merchant'].astype(object).values,
+        'category': expenses_df['category'].astype(object).fillna('Other').values,
+        'cents': pd.to_numeric(cents, errors='coerce').astype('float64').values,
+        'date': pd.to_datetime(expenses_df['date'], errors='coerce').values,
+    }).dropna(subset=['cents', 'date'])
+    df = df[df['key'] != ''].sort_values(['key', 'date'], kind='stable')
+    if df.empty:
+        return []
+
+    same_merchant = df['key'] == df['key'].shift()
+    gaps = df['date'].diff().dt.days.where(same_merchant)
+    # Several charges from one merchant on one day are one charge
+    gaps = gaps.where(gaps != 0)
+    for name, (days, deviation) in PERIODS.items():
+        df[name] = ((gaps - days).abs() <= deviation).astype('float64').where(gaps.notna())
+    df['gap'] = gaps
+
+    grouped = df.groupby('key', sort=False)
+    stats = grouped.agg(
+        gaps=('gap', 'count'),
+        interval_days=('gap', 'median'),
+        amount=('cents', 'median'),
+        amount_mean=('cents', 'mean'),
+        amount_std=('cents', 'std'),
+        last_date=('date', 'max'),
+        merchant=('merchant', 'last'),
+        category=('category', 'last'),
+        **{name: (name, 'mean') for name in PERIODS}
+    )
+    stats['occurrences'] = stats['gaps'] + 1
+    variation = (stats['amount_std'].fillna(0) / stats['amount_mean']).where(stats['amount_mean'] > 0)
+    # First period, shortest first, that the merchant's gaps follow
+    stats['period'] = None
+    for name in reversed(PERIODS):
+        regular = (
+            (stats[name] >= min_regular_share)
+            & (stats['occurrences'] >= (2 if name == 'annual' else min_occurrences))
+        )
+        stats.loc[regular, 'period'] = name
+    stats = stats[stats['period'].notna() & (variation <= max_amount_variation)]
+
+    as_of = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now().normalize()
+    recurring = []
+    for row in stats.itertuples():
+        period_days = PERIODS[row.period][0]
+        amount = row.amount / 100
+        recurring.append({
+            'merchant': row.merchant,
+            'category': row.category,
+            'period': row.period,
+            'interval_days': round(float(row.interval_days), 1),
+            'amount': round(amount, 2),
+            'monthly_cost': round(amount * DAYS_PER_MONTH / period_days, 2),
+            'occurrences': int(row.occurrences),
+            'last_date': row.last_date.strftime('%Y-%m-%d'),
+            'next_date': (row.last_date + pd.Timedelta(days=round(row.interval_days))).strftime('%Y-%m-%d'),
+            'active': bool(as_of - row.last_date <= pd.Timedelta(days=1.5 * period_days)),
+        })
+    return sorted(recurring, key=lambda r: r['monthly_cost'], reverse=True)
@@ -0,0 +1,100 @@
+import bisect
+import re
+
+# Record fields covered by full-text search
+SEARCH_FIELDS = ('merchant', 'items', 'description')
+SEARCH_COLUMNS = ['id', *SEARCH_FIELDS]
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lowercase word tokens of a text"""
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def record_tokens(record):
+    """Distinct tokens of a record's searchable fields"""
+    tokens = set()
+    for field in SEARCH_FIELDS:
+        value = record.get(field)
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(str(part) for part in value)
+        tokens.update(tokenize(value))
+    return tokens
+
+
+class SearchIndex:
+    """Inverted index from word tokens to expense ids
+
+    Every query term matches as a prefix: the sorted vocabulary is
+    bisected for the range of tokens starting with it and their posting
+    sets are unioned. Results must match all terms.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []
+
+    @classmethod
+    def from_records(cls, records):
+        """Build an index over stored records"""
+        index = cls()
+        postings = index.postings
+        for record in records:
+            expense_id = record.get('id')
+            for token in record_tokens(record):
+                ids = postings.get(token)
+                if ids is None:
+                    ids = postings[token] = set()
+                ids.add(expense_id)
+        # Sort the vocabulary once rather than inserting token by token
+        index.vocabulary = sorted(postings)
+        return index
+
+    def add(self, record):
+        expense_id = record.get('id')
+        for token in record_tokens(record):
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                bisect.insort(self.vocabulary, token)
+            ids.add(expense_id)
+
+    def remove(self, record):
+        expense_id = record.get('id')
+        for token in record_tokens(record):
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(expense_id)
+            if not ids:
+                del self.postings[token]
+                position = bisect.bisect_left(self.vocabulary, token)
+                del self.vocabulary[position]
+
+    def _prefix_ids(self, prefix):
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        # Every token with the prefix sorts before prefix + the highest code point
+        end = bisect.bisect_left(self.vocabulary, prefix + '\U0010ffff', start)
+        if end - start == 1:
+            return self.postings[self.vocabulary[start]]
+        ids = set()
+        for token in self.vocabulary[start:end]:
+            ids |= self.postings[token]
+        return ids
+
+    def search(self, query):
+        """Set of ids matching every term of a query by prefix"""
+        terms = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not terms:
+            return set()
+        # Longer terms are usually the most selective; start from them
+        result = set(self._prefix_ids(terms[0]))
+        for term in terms[1:]:
+            if not result:
+                break
+            result &= self._prefix_ids(term)
+        return result
@@ -0,0 +1,290 @@
+import sqlite3
+import json
+import os
+from contextlib import contextmanager
+import pandas as pd
+
+from utils.money import store_cents
+
+# Columns of expense frames; amount is derived from amount_cents for display
+COLUMNS = ['id', 'merchant', 'amount', 'amount_cents', 'date', 'items', 'category', 'description', 'timestamp']
+# Columns stored per expense: money is kept as integer cents only
+STORED_COLUMNS = [col for col in COLUMNS if col != 'amount']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT,
+    merchant TEXT,
+    amount_cents INTEGER,
+    date TEXT,
+    items TEXT,
+    category TEXT,
+    description TEXT,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date);
+CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category, date);
+CREATE INDEX IF NOT EXISTS idx_expenses_merchant ON expenses(merchant, date);
+"""
+
+ID_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_expenses_id ON expenses(id)"
+
+# Row order of the date-descending frame returned by load_expenses
+ORDER_BY = "ORDER BY date DESC, rowid"
+
+
+def _normalize_value(column, value):
+    """Convert a record value into something SQLite can store"""
+    if value is None:
+        return None
+    if column == 'amount_cents':
+        return int(value)
+    if column == 'date':
+        if isinstance(value, str) and len(value) == 10 and value[4] == '-' and value[7] == '-':
+            # Already YYYY-MM-DD; skip the comparatively slow parse
+            return value
+        return pd.to_datetime(value).strftime('%Y-%m-%d')
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(v) for v in value)
+    return str(value)
+
+
+def projected_columns(columns):
+    """Validate a column projection, defaulting to every column"""
+    if columns is None:
+        return COLUMNS
+    unknown = [col for col in columns if col not in COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown expense columns: {unknown}")
+    return list(columns)
+
+
+def _select_list(columns):
+    """SQL select list of frame columns, deriving amount from amount_cents"""
+    return ', '.join('amount_cents / 100.0 AS amount' if col == 'amount' else col for col in columns)
+
+
+def _to_row(record):
+    """Order a record dict into a tuple of STORED_COLUMNS"""
+    record = _with_cents(record)
+    return tuple(_normalize_value(col, record.get(col)) for col in STORED_COLUMNS)
+
+
+def _with_cents(record):
+    """Copy of a record with its amount stored as amount_cents"""
+    return store_cents(dict(record))
+
+
+class SQLiteStore:
+    """SQLite-backed expense storage with indexed date, category and merchant"""
+
+    def __init__(self, db_file="expenses.db"):
+        self.db_file = db_file
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(expenses)")]
+            if 'id' not in columns:
+                # Databases created before stable ids were introduced
+                conn.execute("ALTER TABLE expenses ADD COLUMN id TEXT")
+            if 'amount_cents' not in columns:
+                conn.execute("ALTER TABLE expenses ADD COLUMN amount_cents INTEGER")
+        self.migrate_amounts()
+        self.backfill_ids()
+        with self._connect() as conn:
+            conn.execute(ID_INDEX)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps the store safe to share
+        # between Streamlit script threads
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def storage_paths(self):
+        """Files whose changes mean the stored data changed"""
+        return [self.db_file, self.db_file + "-wal"]
+
+    def count(self):
+        """Number of stored expenses"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+
+    def select(self, start_date=None, end_date=None, categories=None, merchants=None, columns=None):
+        """Select expenses as a DataFrame, filtering in SQL on indexed columns"""
+        columns = projected_columns(columns)
+        clauses, params = [], []
+        if start_date is not None:
+            clauses.append("date >= ?")
+            params.append(_normalize_value('date', start_date))
+        if end_date is not None:
+            clauses.append("date <= ?")
+            params.append(_normalize_value('date', end_date))
+        if categories:
+            clauses.append(f"category IN ({','.join('?' * len(categories))})")
+            params.extend(categories)
+        if merchants:
+            clauses.append(f"merchant IN ({','.join('?' * len(merchants))})")
+            params.extend(merchants)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT {_select_list(columns)} FROM expenses {where} {ORDER_BY}"
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def select_ids(self, ids, columns=None):
+        """Select the expenses with the given ids as a DataFrame, newest first"""
+        columns = projected_columns(columns)
+        ids = list(ids)
+        frames = []
+        with self._connect() as conn:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(ids), 900):
+                chunk = ids[start:start + 900]
+                sql = (f"SELECT {_select_list(columns)}, date AS _date, rowid AS _rowid FROM expenses "
+                       f"WHERE id IN ({','.join('?' * len(chunk))})")
+                frames.append(pd.read_sql_query(sql, conn, params=chunk))
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(frames, ignore_index=True)
+        df = df.sort_values(['_date', '_rowid'], ascending=[False, True])
+        return df[columns].reset_index(drop=True)
+
+    def iter_batches(self, batch_size=5000, columns=None):
+        """Yield expenses as DataFrames of at most batch_size rows, newest first"""
+        columns = projected_columns(columns)
+        with self._connect() as conn:
+            cursor = conn.execute(f"SELECT {_select_list(columns)} FROM expenses {ORDER_BY}")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=columns)
+
+    def insert(self, records):
+        """Insert records in a single transaction"""
+        placeholders = ', '.join('?' * len(STORED_COLUMNS))
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO expenses ({', '.join(STORED_COLUMNS)}) VALUES ({placeholders})",
+                [_to_row(record) for record in records]
+            )
+
+    def replace_all(self, records):
+        """Replace the whole table with the given records"""
+        placeholders = ', '.join('?' * len(STORED_COLUMNS))
+        with self._connect() as conn:
+            conn.execute("DELETE FROM expenses")
+            conn.executemany(
+                f"INSERT INTO expenses ({', '.join(STORED_COLUMNS)}) VALUES ({placeholders})",
+                [_to_row(record) for record in records]
+            )
+
+    def get(self, expense_id):
+        """Fetch one stored expense by id as a dict, or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(STORED_COLUMNS)} FROM expenses WHERE id = ?", (expense_id,)
+            ).fetchone()
+        return dict(zip(STORED_COLUMNS, row)) if row is not None else None
+
+    def delete(self, expense_id):
+        """Delete an expense by id"""
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
+            return cursor.rowcount > 0
+
+    def update(self, expense_id, updated_data):
+        """Update fields of an expense by id"""
+        fields = {k: v for k, v in _with_cents(updated_data).items() if k in STORED_COLUMNS and k != 'id'}
+        if not fields:
+            return False
+        assignments = ', '.join(f"{col} = ?" for col in fields)
+        params = [_normalize_value(col, value) for col, value in fields.items()]
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE expenses SET {assignments} WHERE id = ?", params + [expense_id]
+            )
+            return cursor.rowcount > 0
+
+    def migrate_amounts(self):
+        """Fill amount_cents of rows written with float amounts; returns rows converted"""
+        with self._connect() as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(expenses)")]
+            if 'amount' not in columns:
+                return 0
+            # Databases created with float amounts keep the old column, unused
+            cursor = conn.execute(
+                "UPDATE expenses SET amount_cents = CAST(ROUND(amount * 100) AS INTEGER) "
+                "WHERE amount_cents IS NULL AND amount IS NOT NULL"
+            )
+            return cursor.rowcount
+
+    def backfill_ids(self):
+        """Assign random ids to rows stored without one"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE expenses SET id = lower(hex(randomblob(16))) WHERE id IS NULL"
+            )
+            return cursor.rowcount
+
+    def clear(self):
+        """Delete all expenses"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM expenses")
+
+    def group_stats(self):
+        """(grouping, key, sum, count, min, max) rows in cents for every aggregate group, computed in SQL"""
+        queries = {
+            'category': "SELECT category, SUM(amount_cents), COUNT(*), MIN(amount_cents), MAX(amount_cents) "
+                        "FROM expenses WHERE amount_cents IS NOT NULL GROUP BY category",
+            'month': "SELECT substr(date, 1, 7), SUM(amount_cents), COUNT(*), MIN(amount_cents), MAX(amount_cents) "
+                     "FROM expenses WHERE amount_cents IS NOT NULL GROUP BY substr(date, 1, 7)",
+            'month_category': "SELECT substr(date, 1, 7), category, SUM(amount_cents), COUNT(*), "
+                              "MIN(amount_cents), MAX(amount_cents) FROM expenses "
+                              "WHERE amount_cents IS NOT NULL GROUP BY substr(date, 1, 7), category",
+        }
+        rows = []
+        with self._connect() as conn:
+            for grouping, sql in queries.items():
+                for row in conn.execute(sql):
+                    if grouping == 'month_category':
+                        rows.append((grouping, (row[0], row[1])) + tuple(row[2:]))
+                    else:
+                        rows.append((grouping,) + tuple(row))
+        return rows
+
+    def group_extremes(self, grouping, key):
+        """(min, max) amount in cents of one aggregate group"""
+        if grouping == 'category':
+            where, params = "category = ?", (key,)
+        elif grouping == 'month':
+            where, params = "date >= ? AND date < ?", (f"{key}-01", f"{key}-32")
+        else:
+            month, category = key
+            where, params = "category = ? AND date >= ? AND date < ?", (category, f"{month}-01", f"{month}-32")
+        with self._connect() as conn:
+            return conn.execute(
+                f"SELECT MIN(amount_cents), MAX(amount_cents) FROM expenses WHERE {where}", params
+            ).fetchone()
+
+
+def migrate_json_to_sqlite(json_file="expenses.json", db_file="expenses.db"):
+    """Copy every record of a JSON ledger into a SQLite store"""
+    store = SQLiteStore(db_file)
+    if not os.path.exists(json_file):
+        return 0
+    with open(json_file, 'r') as f:
+        data = json.load(f)
+    store.insert(data)
+    return len(data)
+
+
+if __name__ == "__main__":
+    count = migrate_json_to_sqlite()
+    print(f"Migrated {count} expenses to expenses.db")
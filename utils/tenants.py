@@ -0,0 +1,125 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+
+from utils.data_manager import DataManager
+
+
+def user_tenant(email):
+    """Tenant id of a signed-in user"""
+    return f"user:{email}"
+
+
+def ledger_tenant(name):
+    """Tenant id of a ledger chosen by name, kept apart from signed-in users"""
+    return f"ledger:{name}"
+
+
+def tenant_directory_name(tenant_id):
+    """Filesystem-safe directory name of a tenant id
+
+    A readable slug followed by a hash of the exact id, so ids differing
+    only in case or punctuation never share a directory, even on
+    case-insensitive filesystems.
+    """
+    tenant_id = str(tenant_id)
+    if not tenant_id.strip():
+        raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+    slug = re.sub(r'[^a-z0-9._-]+', '_', tenant_id.strip().lower()).strip('._')[:48]
+    digest = hashlib.sha256(tenant_id.encode('utf-8')).hexdigest()[:16]
+    return f"{slug}-{digest}" if slug else digest
+
+
+class TenantRegistry:
+    """One DataManager per tenant, each on its own files, with LRU eviction
+
+    Every tenant's ledger lives under base_dir/<tenant>/, so tenants never
+    share a file, a writer lock or a cache. At most max_tenants managers
+    (and their cached frames and indexes) are kept in memory; the least
+    recently used one is flushed and dropped when another tenant arrives.
+    The registry lock only guards the LRU bookkeeping, so opening a large
+    ledger does not hold up requests for other tenants.
+    """
+
+    def __init__(self, base_dir="ledgers", max_tenants=16, default_tenant=ledger_tenant("default"),
+                 legacy_file="expenses.json", **data_manager_options):
+        self.base_dir = base_dir
+        self.max_tenants = max_tenants
+        # The default tenant starts from the single-user ledger, if any
+        self.default_tenant = default_tenant
+        self.legacy_file = legacy_file
+        self.data_manager_options = data_manager_options
+        self._managers = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-tenant locks so two requests do not open the same ledger twice
+        self._opening = {}
+        os.makedirs(base_dir, exist_ok=True)
+
+    def tenant_dir(self, tenant_id):
+        """Directory holding a tenant's ledger files"""
+        return os.path.join(self.base_dir, tenant_directory_name(tenant_id))
+
+    def _open(self, tenant_id):
+        directory = self.tenant_dir(tenant_id)
+        os.makedirs(directory, exist_ok=True)
+        data_file = os.path.join(directory, "expenses.json")
+        if (tenant_id == self.default_tenant and self.legacy_file
+                and os.path.exists(self.legacy_file) and not os.path.exists(data_file)):
+            shutil.copyfile(self.legacy_file, data_file)
+        return DataManager(
+            data_file=data_file,
+            db_file=os.path.join(directory, "expenses.db"),
+            partition_dir=os.path.join(directory, "expenses_partitions"),
+            **self.data_manager_options
+        )
+
+    def get(self, tenant_id):
+        """DataManager of a tenant, opening its ledger on first use"""
+        key = tenant_directory_name(tenant_id)
+        with self._lock:
+            manager = self._managers.get(key)
+            if manager is not None:
+                self._managers.move_to_end(key)
+                return manager
+            opening = self._opening.setdefault(key, threading.Lock())
+
+        with opening:
+            with self._lock:
+                manager = self._managers.get(key)
+                if manager is not None:
+                    self._managers.move_to_end(key)
+                    return manager
+            manager = self._open(tenant_id)
+            with self._lock:
+                self._managers[key] = manager
+                self._opening.pop(key, None)
+                evicted = []
+                while len(self._managers) > self.max_tenants:
+                    evicted.append(self._managers.popitem(last=False)[1])
+        for idle_manager in evicted:
+            idle_manager.close()
+        return manager
+
+    def evict(self, tenant_id):
+        """Flush and drop a tenant's manager from memory"""
+        with self._lock:
+            manager = self._managers.pop(tenant_directory_name(tenant_id), None)
+        if manager is not None:
+            manager.close()
+        return manager is not None
+
+    def active_tenants(self):
+        """Tenants currently held in memory, least recently used first"""
+        with self._lock:
+            return list(self._managers)
+
+    def close(self):
+        """Flush and drop every tenant"""
+        with self._lock:
+            managers = list(self._managers.values())
+            self._managers.clear()
+        for manager in managers:
+            manager.close()